@@ -0,0 +1,560 @@
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from datetime import timedelta
+
+from logtime.logtime import Log
+from logtime.logtime import LogItem
+from logtime.logtime import LogItemsParser
+from logtime.columnar import ColumnarLog
+from logtime.logtime import DATETIME_FORMAT
+from logtime.index import StartIndex
+
+
+WORDS = ('programming', 'logtime', 'readme', 'eating', 'tv', 'a3m', 'living')
+
+
+def yield_log_items(seed=0, tag_depth=3, tag_count=50, gap_rate=0.2):
+    # Endless lines of a log, as the lines of every item together with the
+    # date it ends at. There are tag_count distinct tags up to tag_depth
+    # levels deep, and a gap without an item after gap_rate of the items.
+    rng = random.Random(seed)
+    words = WORDS + tuple('tag{}'.format(i) for i in range(len(WORDS), tag_count // len(WORDS)))
+    tags = [
+        ' / '.join(rng.choice(words) for _ in range(rng.randint(1, tag_depth)))
+        for _ in range(tag_count)
+    ]
+    date = datetime(1970, 1, 1)
+    while True:
+        lines = [date.strftime(DATETIME_FORMAT), rng.choice(tags)]
+        if rng.random() < 0.05:
+            lines.append('# ' + rng.choice(tags))
+        date += timedelta(minutes=rng.randint(5, 240))
+        if rng.random() < gap_rate:
+            lines.append(date.strftime(DATETIME_FORMAT))
+            date += timedelta(minutes=rng.randint(5, 600))
+        yield lines, date
+
+
+def generate_log_lines(lines, seed=0, **options):
+    result = []
+    for item_lines, date in yield_log_items(seed, **options):
+        if len(result) >= lines:
+            break
+        result.extend(item_lines)
+    result.append(date.strftime(DATETIME_FORMAT))
+    return result
+
+
+def generate_log_text(items, seed=0, **options):
+    result = []
+    for (item_lines, date), _ in zip(yield_log_items(seed, **options), range(items)):
+        result.extend(item_lines)
+    result.append(date.strftime(DATETIME_FORMAT))
+    return '\n'.join(result)
+
+
+def measure(f, repeat=3):
+    # Best time of repeat calls, garbage is collected between them only.
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            t = time.perf_counter()
+            f()
+            elapsed = time.perf_counter() - t
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class StrptimeLogItemsParser(LogItemsParser):
+    # Parser before the fast path: strptime and an exception per tag line.
+    def parse_date(self, line):
+        try:
+            return datetime.strptime(line, DATETIME_FORMAT)
+        except ValueError:
+            return None
+
+
+def bench_parse(lines=1000000):
+    log_lines = generate_log_lines(lines)
+    reference = measure(lambda: list(StrptimeLogItemsParser().parse_lines(log_lines)), 1)
+    fast = measure(lambda: list(LogItemsParser().parse_lines(log_lines)))
+    print('parse {} lines: strptime {:.2f}s, fast path {:.2f}s, {:.1f}x'.format(
+        lines, reference, fast, reference / fast
+    ))
+
+
+def bench_slice(lines=1000000):
+    log = Log(LogItemsParser().parse_lines(generate_log_lines(lines)))
+    start = log.get_start()
+    months = [(start + timedelta(days=30 * i), start + timedelta(days=30 * i + 30)) for i in range(100)]
+    plain = measure(lambda: [log[a:b] for a, b in months])
+    year = (start, start + timedelta(days=365))
+    stepped = measure(lambda: log[year[0]:year[1]:timedelta(hours=1)])
+    print('slice: 100 month slices {:.3f}s, a year by hour {:.3f}s'.format(plain, stepped))
+
+
+def bench_group(lines=1000000):
+    log = Log(LogItemsParser().parse_lines(generate_log_lines(lines)))
+    levels = measure(lambda: log.group(0, 1, 2))
+    function = measure(lambda: log.group(lambda l: l.tags[0], lambda l: l.start.year))
+    print('group {} items: three levels {:.3f}s, two functions {:.3f}s'.format(
+        len(log), levels, function
+    ))
+
+
+def bench_filter(lines=1000000):
+    log = Log(LogItemsParser().parse_lines(generate_log_lines(lines)))
+    query = 'programming and not (tv or eating) or a3m'
+    from logtime import query as q
+    expression = q.parse(query).left
+    tree = measure(lambda: [l for l in log if expression.matches(l)])
+    indexed = measure(lambda: log.filter(query))
+    selective = measure(lambda: log.filter('tv and readme and living'))
+    print('filter {} items: matches() tree {:.3f}s, indexed filter {:.3f}s, selective {:.4f}s'.format(
+        len(log), tree, indexed, selective
+    ))
+
+
+def bench_query_parse(terms=(100, 1000, 10000)):
+    from logtime.query import Lexer
+    from logtime.query import Parser
+    for n in terms:
+        text = ' or '.join('project-{}'.format(i) for i in range(n))
+        print('query of {} terms ({} characters): tokenize {:.4f}s, parse {:.4f}s'.format(
+            n, len(text), measure(lambda: Lexer().tokenize(text)), measure(lambda: Parser().parse(text))
+        ))
+
+
+def bench_columnar(lines=1000000):
+    log_lines = generate_log_lines(lines)
+    log = Log(LogItemsParser().parse_lines(log_lines))
+    columnar_log = ColumnarLog(log)
+    start = log.get_start()
+    year = slice(start, start + timedelta(days=365))
+    for name, f in [
+        ('slice a year', lambda l: l[year]),
+        ('sum', lambda l: l.sum()),
+        ('group three levels', lambda l: l.group(0, 1, 2)),
+    ]:
+        print('columnar {}: Log {:.4f}s, ColumnarLog {:.4f}s'.format(
+            name, measure(lambda: f(log)), measure(lambda: f(columnar_log))
+        ))
+
+
+def bench_append(items=(10000, 100000, 1000000)):
+    logitems = list(LogItemsParser().parse_lines(generate_log_lines(max(items) * 2)))
+    for n in items:
+        def build():
+            log = Log(())
+            log.get_index(StartIndex)
+            for logitem in logitems[:n]:
+                log.append(logitem)
+        print('append {} items with a start index: {:.3f}s, extend {:.3f}s'.format(
+            n, measure(build, 1), measure(lambda: Log(()).extend(logitems[:n]), 1)
+        ))
+
+
+def bench_parse_date(calls=10000):
+    from logtime import parse_date
+    for text in ('2016-09-26 14:00', 'last week', 'today - 3 days'):
+        parser = measure(lambda: [parse_date.Parser().parse(text) for _ in range(calls)])
+        cached = measure(lambda: [parse_date.parse_date(text) for _ in range(calls)])
+        print('parse_date {!r} x {}: Parser {:.4f}s, parse_date {:.4f}s'.format(
+            text, calls, parser, cached
+        ))
+
+
+def bench_follow(lines=1000000):
+    import tempfile
+    from logtime.follow import LogFollower
+    log_lines = generate_log_lines(lines)
+    end = datetime.strptime(log_lines[-1], DATETIME_FORMAT)
+    fd, path = tempfile.mkstemp()
+    with os.fdopen(fd, 'w') as f:
+        f.write('\n'.join(log_lines))
+    try:
+        follower = LogFollower(path)
+        follower.update()
+
+        def append_item():
+            nonlocal end
+            with open(path, 'a') as f:
+                f.write('\nprogramming\n' + (end + timedelta(minutes=5)).strftime(DATETIME_FORMAT))
+            end += timedelta(minutes=5)
+
+        reparse = measure(lambda: (append_item(), Log.from_file(path).sum()), 1)
+        update = measure(lambda: (append_item(), follower.update(), follower.sum()))
+        print('follow {} lines, one item appended: parse file {:.3f}s, update {:.5f}s'.format(
+            lines, reparse, update
+        ))
+    finally:
+        os.remove(path)
+
+
+def bench_cache(lines=1000000):
+    import tempfile
+    from logtime import cache
+    log_lines = generate_log_lines(lines)
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'time.log')
+    with open(path, 'w') as f:
+        f.write('\n'.join(log_lines) + '\n')
+    try:
+        parse = measure(lambda: Log.from_file(path), 1)
+        cold = measure(lambda: cache.load_log(path), 1)
+        warm = measure(lambda: cache.load_log(path))
+        end = datetime.strptime(log_lines[-1], DATETIME_FORMAT) + timedelta(minutes=5)
+        with open(path, 'a') as f:
+            f.write('programming\n' + end.strftime(DATETIME_FORMAT))
+        appended = measure(lambda: cache.load_log(path), 1)
+        print('cache {} lines: parse {:.3f}s, first load {:.3f}s, cached {:.3f}s, appended {:.3f}s'.format(
+            lines, parse, cold, warm, appended
+        ))
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+def bench_from_files(lines=1000000, files=8, workers=(1, 2, 4)):
+    import tempfile
+    log_lines = generate_log_lines(lines)
+    directory = tempfile.mkdtemp()
+    paths = []
+    size = len(log_lines) // files
+    begin = 0
+    for i in range(files):
+        end = min(len(log_lines), begin + size)
+        while end < len(log_lines) and not log_lines[end][:1].isdigit():
+            end += 1
+        paths.append(os.path.join(directory, '{}.log'.format(i)))
+        with open(paths[-1], 'w') as f:
+            f.write('\n'.join(log_lines[begin:end]))
+        begin = end
+    try:
+        end = datetime.strptime(log_lines[-1], DATETIME_FORMAT)
+        start = (end - (end - datetime(1970, 1, 1)) / 2).replace(second=0, microsecond=0)
+        print('from_files {} lines in {} files: Log.from_file {:.3f}s'.format(
+            lines, files, measure(lambda: [list(Log.from_file(p)) for p in paths], 1)
+        ))
+        for n in workers:
+            print('    {} workers: {:.3f}s, ColumnarLog {:.3f}s, second half {:.3f}s'.format(
+                n,
+                measure(lambda: Log.from_files(paths, n), 1),
+                measure(lambda: ColumnarLog.from_files(paths, n), 1),
+                measure(lambda: ColumnarLog.from_files(paths, n, start=start), 1),
+            ))
+    finally:
+        for path in paths:
+            os.remove(path)
+        os.rmdir(directory)
+
+
+def bench_chunked(lines=1000000, workers=(1, 2, 4, 8)):
+    import tempfile
+    fd, path = tempfile.mkstemp()
+    with os.fdopen(fd, 'w') as f:
+        f.write('\n'.join(generate_log_lines(lines)))
+    try:
+        print('chunked {} lines ({} cpus): LogItemsParser {:.3f}s'.format(
+            lines, os.cpu_count(), measure(lambda: Log.from_file(path), 1)
+        ))
+        for n in workers:
+            print('    {} workers: Log {:.3f}s, ColumnarLog {:.3f}s'.format(
+                n,
+                measure(lambda: Log.from_file(path, workers=n), 1),
+                measure(lambda: ColumnarLog.from_file(path, workers=n), 1),
+            ))
+    finally:
+        os.remove(path)
+
+
+def bench_fix(lines=1000000, buffer_size=100000):
+    import io
+    from logtime.utils import fix
+    from logtime.utils import write_fixed
+    log_lines = generate_log_lines(lines)
+    # Whole years moved to the end, so runs come out of order.
+    shuffled = log_lines[len(log_lines) // 2:] + log_lines[:len(log_lines) // 2]
+    text = '\n'.join(shuffled)
+    for name, f in [
+        ('fix', lambda: fix(text)),
+        ('write_fixed', lambda: write_fixed(shuffled, io.StringIO(), buffer_size)),
+    ]:
+        elapsed = measure(f, 1)
+        tracemalloc.start()
+        f()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print('{} {} lines out of order: {:.3f}s, peak {:.0f}MB'.format(name, lines, elapsed, peak / 2 ** 20))
+
+
+def strftime_str(log):
+    # Log.__str__ before the single pass writer.
+    texts = []
+    for logitem, next_logitem in zip(log, list(log)[1:] + [None]):
+        include_end = True
+        if not next_logitem and not logitem.ended:
+            include_end = False
+        if next_logitem and next_logitem.start == logitem.end:
+            include_end = False
+        text = '{}\n{}'.format(logitem.start.strftime(DATETIME_FORMAT), ' / '.join(logitem.tags))
+        if include_end:
+            text += '\n' + logitem.end.strftime(DATETIME_FORMAT)
+        texts.append(text)
+    return '\n'.join(texts)
+
+
+def bench_write(lines=1000000):
+    import tempfile
+    log = Log(LogItemsParser().parse_lines(generate_log_lines(lines)))
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        print('write {} items: strftime str {:.3f}s, str {:.3f}s, to_file {:.3f}s'.format(
+            len(log), measure(lambda: strftime_str(log), 1), measure(lambda: str(log)),
+            measure(lambda: log.to_file(path)),
+        ))
+    finally:
+        os.remove(path)
+
+
+def sliced_timeline(log, start, end, step):
+    # Timeline made with a slice of the log per cell, as it was before
+    # report.timeline_cells.
+    lines = []
+    while start < end:
+        stop = min(start + step, end)
+        descriptions = dict.fromkeys(' - '.join(l.tags) for l in log[start:stop] if l.start < stop)
+        lines.append('{} {}'.format(start, ', '.join(descriptions)))
+        start = stop
+    return '\n'.join(lines)
+
+
+def bench_report(lines=1000000):
+    from logtime import report
+    log = Log(LogItemsParser().parse_lines(generate_log_lines(lines)))
+    start = log.get_start()
+    end = start + timedelta(days=365)
+    step = timedelta(minutes=15)
+    print('year-long timeline of {} items: slice per cell {:.3f}s, one sweep {:.3f}s, breakdown {:.3f}s'.format(
+        len(log), measure(lambda: sliced_timeline(log, start, end, step), 1),
+        measure(lambda: report.format_timeline(log, start, end, step)),
+        measure(lambda: report.format_breakdown(log)),
+    ))
+
+
+def bench_rollup(lines=1000000, queries=1000):
+    log = Log(LogItemsParser().parse_lines(generate_log_lines(lines)))
+    start = log.get_start()
+    ranges = [(start + timedelta(days=i), start + timedelta(days=i + 30)) for i in range(queries)]
+    rollup = measure(lambda: Log(log._logitems).rollup(), 1)
+    print('{} monthly sums of programming over {} items: sliced {:.3f}s, rollup {:.3f}s (built in {:.3f}s)'.format(
+        queries, len(log),
+        measure(lambda: [log[a:b].filter(lambda l: l.tags[0] == 'programming').sum() for a, b in ranges], 1),
+        measure(lambda: [log.rollup().sum('programming', a, b) for a, b in ranges]),
+        rollup,
+    ))
+    logitems = list(log)
+    log = Log(logitems[:-10000])
+    log.rollup()
+    print('append 10000 items with a rollup: {:.3f}s'.format(
+        measure(lambda: log.extend(logitems[-10000:]), 1)
+    ))
+
+
+def bench_diff(lines=1000000):
+    log_lines = generate_log_lines(lines)
+    log = Log(LogItemsParser().parse_lines(log_lines))
+    log_lines[len(log_lines) // 2] += ' / changed'
+    other = Log(LogItemsParser().parse_lines(log_lines))
+    print('diff of {} items: sets of str {:.3f}s, diff {:.3f}s, == {:.3f}s'.format(
+        len(log), measure(lambda: set(map(str, log)) ^ set(map(str, other)), 1),
+        measure(lambda: log.diff(other), 1), measure(lambda: log == other, 1),
+    ))
+
+
+class DictLogItem(LogItem):
+    # LogItem with a per-instance __dict__, as it was before __slots__.
+    pass
+
+
+def measure_memory(f):
+    tracemalloc.start()
+    result = f()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def bench_memory(lines=1000000):
+    log_lines = generate_log_lines(lines)
+    builders = [
+        ('LogItem with __dict__', lambda: Log(LogItemsParser(DictLogItem).parse_lines(log_lines))),
+        ('LogItem with __slots__', lambda: Log(LogItemsParser().parse_lines(log_lines))),
+        ('ColumnarLog', lambda: ColumnarLog(LogItemsParser().parse_lines(log_lines))),
+    ]
+    for name, build in builders:
+        log, size = measure_memory(build)
+        print('memory {}: {:.0f} bytes per entry'.format(name, size / len(log)))
+        del log
+
+
+def measure_import(statement='from logtime import Log', runs=5):
+    # Best cumulative time of importing logtime in microseconds, from
+    # python -X importtime in fresh interpreters, and the logtime modules
+    # it imported.
+    import subprocess
+    best, modules = None, set()
+    for _ in range(runs):
+        stderr = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', statement],
+            stderr=subprocess.PIPE, universal_newlines=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stderr
+        for line in stderr.splitlines():
+            if not line.startswith('import time:') or line.endswith('package'):
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            name = name.strip()
+            if name == 'logtime':
+                best = int(cumulative) if best is None else min(best, int(cumulative))
+            if name.startswith('logtime'):
+                modules.add(name)
+    return best, modules
+
+
+def bench_import(budget=None):
+    # Whether importing logtime fits in the budget of milliseconds.
+    microseconds, modules = measure_import()
+    print('import logtime: {:.1f}ms, modules: {}'.format(microseconds / 1000, ', '.join(sorted(modules))))
+    if budget is not None and microseconds > budget * 1000:
+        print('over the budget of {}ms'.format(budget))
+        return False
+    return True
+
+
+def run_suite(items=100000, seed=0, repeat=3, **options):
+    # Best time of every operation on a generated log, by name.
+    from logtime import report
+    from logtime.utils import fix
+    text = generate_log_text(items, seed, **options)
+    log = Log(text)
+    start = log.get_start()
+    month = slice(start + timedelta(days=30), start + timedelta(days=60))
+    year = slice(start, start + timedelta(days=365), timedelta(days=1))
+    operations = [
+        ('parse_text', lambda: list(LogItemsParser().parse_text(text))),
+        ('slice', lambda: log[month]),
+        ('slice_stepped', lambda: log[year]),
+        ('filter_tag', lambda: log.filter('programming')),
+        ('filter_boolean', lambda: log.filter('programming and not (tv or eating) or a3m')),
+        ('filter_slice', lambda: log.filter('tv [{:%Y-%m-%d};{:%Y-%m-%d}]'.format(month.start, month.stop))),
+        ('sum', lambda: log.sum()),
+        ('str', lambda: str(log)),
+        ('fix', lambda: fix(text)),
+        ('timeline', lambda: report.format_timeline(log, year.start, year.stop)),
+        ('breakdown', lambda: report.format_breakdown(log)),
+    ]
+    return {name: measure(f, repeat) for name, f in operations}
+
+
+def compare(baseline, results, threshold=0.1):
+    # Names of the operations that got slower than baseline by more than
+    # threshold, printing every ratio.
+    regressions = []
+    for name, elapsed in sorted(results.items()):
+        if name not in baseline:
+            continue
+        ratio = elapsed / baseline[name]
+        regressed = ratio > 1 + threshold
+        print('{:16} {:9.4f}s {:9.4f}s {:6.2f}x{}'.format(
+            name, baseline[name], elapsed, ratio, '  slower' if regressed else ''
+        ))
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main(args):
+    import argparse
+    import json
+    import platform
+    parser = argparse.ArgumentParser(description='Benchmarks of logtime.')
+    parser.add_argument('lines', nargs='?', type=int, default=1000000,
+                        help='lines of the log for the comparisons run without --suite')
+    parser.add_argument('--suite', action='store_true', help='time the suite of operations')
+    parser.add_argument('--import-budget', type=float,
+                        help='fail if importing logtime takes more milliseconds than this')
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tag-depth', type=int, default=3)
+    parser.add_argument('--tag-count', type=int, default=50)
+    parser.add_argument('--gap-rate', type=float, default=0.2)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='save the results of the suite to this file')
+    parser.add_argument('--compare', help='results of an earlier run of the suite to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='slowdown over the earlier run counted as a regression')
+    args = parser.parse_args(args)
+    if args.import_budget is not None:
+        return 0 if bench_import(args.import_budget) else 1
+    if not args.suite:
+        run_comparisons(args.lines)
+        return 0
+    options = {
+        'items': args.items, 'seed': args.seed, 'tag_depth': args.tag_depth,
+        'tag_count': args.tag_count, 'gap_rate': args.gap_rate,
+    }
+    results = run_suite(repeat=args.repeat, **options)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'options': options,
+                'python': platform.python_version(),
+                'results': results,
+            }, f, indent=4, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['options'] != options:
+            print('options differ from {}: {}'.format(args.compare, baseline['options']))
+        return 1 if compare(baseline['results'], results, args.threshold) else 0
+    for name, elapsed in sorted(results.items()):
+        print('{:16} {:9.4f}s'.format(name, elapsed))
+    return 0
+
+
+def run_comparisons(lines):
+    bench_import()
+    bench_parse(lines)
+    bench_memory(lines)
+    bench_slice(lines)
+    bench_group(lines)
+    bench_filter(lines)
+    bench_query_parse()
+    bench_parse_date()
+    bench_append()
+    bench_follow(lines)
+    bench_cache(lines)
+    bench_from_files(lines)
+    bench_chunked(lines)
+    bench_fix(lines)
+    bench_write(lines)
+    bench_report(lines)
+    bench_rollup(lines)
+    bench_diff(lines)
+    bench_columnar(lines)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
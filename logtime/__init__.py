@@ -1,3 +1,20 @@
 from .logtime import Log
 from .logtime import LogItem
-from .query import parse as parse_query
+from .logtime import LogStream
+
+
+def __getattr__(name):
+    # Anything but the core is imported on first use, to keep the import
+    # of logtime fast for short-lived command line runs.
+    from importlib import import_module
+    if name == 'parse_query':
+        return import_module('.query', __name__).parse
+    if name in SUBMODULES:
+        return import_module('.' + name, __name__)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+
+SUBMODULES = (
+    'cache', 'colors', 'columnar', 'follow', 'grouping', 'index', 'instrument',
+    'parallel', 'parse_date', 'query', 'reader', 'report', 'rollup', 'utils',
+)
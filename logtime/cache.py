@@ -0,0 +1,142 @@
+from array import array
+import hashlib
+import os
+
+from .columnar import Columns
+from .columnar import ColumnarLog
+from .columnar import OPEN_END
+from .columnar import from_minutes
+from .columnar import to_minutes
+from .columnar import _row
+from .logtime import LogItemsParser
+from .logtime import WHITESPACED_DESCRIPTION_SEPARATOR
+
+# Also written at the end, so a cache cut short is told apart.
+MAGIC = b'logtime2'
+# size and mtime of the file, offset of the end of the last complete line
+# parsed, number of closed items, number of tag paths and start of the
+# item that was going on there.
+HEADER_SIZE = 6
+TAIL_SIZE = 4096
+DIGEST_SIZE = 32
+
+
+def load_log(path, cache_path=None, encoding='utf-8'):
+    """ColumnarLog of the file at path, cached in a binary file next to it.
+
+    The cache holds the closed items as arrays of minutes and tag path
+    ids together with the state of the parser at the end of the last
+    complete line. It is used as is if the size and mtime of the file
+    didn't change. Otherwise, if the file still has the same bytes before
+    that line end, only what comes after it is parsed and the cache is
+    updated, else the whole file is parsed again.
+    """
+    cache_path = cache_path or path + '.cache'
+    cached = load_cache(cache_path)
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        key = [stat.st_size, stat.st_mtime_ns]
+        if cached and not (cached[0][:2].tolist() == key or _is_prefix(f, key[0], cached)):
+            cached = None
+        if cached:
+            header, _, columns, start, description = cached
+            offset = header[2]
+        else:
+            columns, start, description, offset = Columns(), None, None, 0
+        f.seek(offset)
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        parser = LogItemsParser(_row)
+        parser.start, parser.description = start, description
+        for row in parser.feed(_decode(data[:end], encoding)):
+            columns.append(*row)
+        if not cached or end or cached[0][:2].tolist() != key:
+            f.seek(offset + end - min(offset + end, TAIL_SIZE))
+            digest = hashlib.sha256(f.read(min(offset + end, TAIL_SIZE))).digest()
+            save_cache(cache_path, key, offset + end, columns, parser, digest)
+    log = ColumnarLog._from_columns(columns)
+    # The last line may still be written to, its items aren't cached.
+    for row in parser.feed(_decode(data[end:] + b'\n', encoding)):
+        columns.append(*row)
+    row = parser.get_open_logitem()
+    if row:
+        columns.append(*row)
+    return log
+
+
+def _is_prefix(f, size, cached):
+    # Whether the bytes before the cached offset are still the same.
+    header, digest = cached[0], cached[1]
+    offset = header[2]
+    if size < offset:
+        return False
+    f.seek(offset - min(offset, TAIL_SIZE))
+    return hashlib.sha256(f.read(min(offset, TAIL_SIZE))).digest() == digest
+
+
+def _decode(data, encoding):
+    return [line.rstrip('\r') for line in data.decode(encoding).split('\n')[:-1]]
+
+
+def save_cache(path, key, offset, columns, parser, digest):
+    start = to_minutes(parser.start) if parser.start else OPEN_END
+    header = array('q', key + [offset, len(columns), len(columns.paths), start])
+    text = '\n'.join([parser.description or ''] + [
+        WHITESPACED_DESCRIPTION_SEPARATOR.join(p) for p in columns.paths
+    ])
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as f:
+        f.write(MAGIC)
+        header.tofile(f)
+        f.write(digest)
+        columns.starts.tofile(f)
+        columns.ends.tofile(f)
+        columns.path_ids.tofile(f)
+        f.write(text.encode('utf-8'))
+        f.write(MAGIC)
+    os.replace(temporary_path, path)
+
+
+def load_cache(path):
+    # Header, digest of the tail, columns and parser state of the cache at
+    # path, read at once. None if there is no cache or it can't be read,
+    # then the log is parsed again and the cache written anew.
+    try:
+        with open(path, 'rb') as f:
+            data = memoryview(f.read())
+    except FileNotFoundError:
+        return None
+    try:
+        return _read_cache(data)
+    except (ValueError, OverflowError):
+        # Also UnicodeDecodeError of a broken text part.
+        return None
+
+
+def _read_cache(data):
+    position = len(MAGIC) + 8 * HEADER_SIZE + DIGEST_SIZE
+    if len(data) < position + len(MAGIC) or not bytes(data[:len(MAGIC)]) == bytes(data[-len(MAGIC):]) == MAGIC:
+        return None
+    data = data[:-len(MAGIC)]
+    header = array('q')
+    header.frombytes(data[len(MAGIC):len(MAGIC) + 8 * HEADER_SIZE])
+    digest = bytes(data[position - DIGEST_SIZE:position])
+    count, path_count = header[3], header[4]
+    columns = Columns()
+    values = (columns.starts, columns.ends, columns.path_ids)
+    if min(header[2], count, path_count) < 0 or len(data) < position + count * sum(v.itemsize for v in values):
+        return None
+    for column in values:
+        size = count * column.itemsize
+        column.frombytes(data[position:position + size])
+        position += size
+    lines = bytes(data[position:]).decode('utf-8').split('\n')
+    if len(lines) != path_count + 1:
+        return None
+    description = lines[0] or None
+    columns.paths = [tuple(l.split(WHITESPACED_DESCRIPTION_SEPARATOR)) for l in lines[1:]]
+    columns._path_ids = {p: i for i, p in enumerate(columns.paths)}
+    if count and not 0 <= min(columns.path_ids) <= max(columns.path_ids) < path_count:
+        return None
+    start = from_minutes(header[5]) if header[5] != OPEN_END else None
+    return header, digest, columns, start, description
@@ -0,0 +1,239 @@
+from array import array
+from datetime import datetime
+from datetime import timedelta
+
+from .logtime import Log
+from .logtime import LogItem
+from .logtime import LogItemsParser
+from .logtime import LogtimeError
+from .logtime import WHITESPACED_DESCRIPTION_SEPARATOR
+from .logtime import format_datetime
+from .parse_date import parse_date
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+EPOCH = datetime(1970, 1, 1)
+# Stored as the end of items that are still going on, their LogItem views
+# end now, whenever they are made.
+OPEN_END = -2 ** 63
+
+
+def to_minutes(date):
+    delta = date - EPOCH
+    if delta.seconds % 60 or delta.microseconds:
+        raise LogtimeError('Columnar log stores whole minutes only: {}'.format(date))
+    return delta.days * 1440 + delta.seconds // 60
+
+
+def from_minutes(minutes):
+    return EPOCH + timedelta(minutes=minutes)
+
+
+def is_whole_minute(date):
+    return date is None or (date.second == 0 and date.microsecond == 0)
+
+
+class Columns:
+    # Sequence of LogItems kept as arrays of epoch minutes and ids of
+    # interned tag paths. LogItems are made on demand and not kept.
+    def __init__(self):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.path_ids = array('i')
+        self.paths = []
+        self._path_ids = {}
+
+    @classmethod
+    def from_arrays(cls, starts, ends, path_ids, columns):
+        # New columns with tag paths interned in the same table as columns.
+        result = cls()
+        result.starts.frombytes(starts.tobytes())
+        result.ends.frombytes(ends.tobytes())
+        result.path_ids.frombytes(path_ids.tobytes())
+        result.paths = columns.paths
+        result._path_ids = columns._path_ids
+        return result
+
+    def as_numpy(self):
+        # Views on the arrays, they can't grow while these exist so they
+        # must not outlive the call that made them.
+        return (
+            numpy.frombuffer(self.starts, numpy.int64),
+            numpy.frombuffer(self.ends, numpy.int64),
+            numpy.frombuffer(self.path_ids, numpy.intc),
+        )
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, position):
+        return self._make_logitem(
+            self.starts[position], self.ends[position], self.path_ids[position]
+        )
+
+    def __iter__(self):
+        make_logitem = self._make_logitem
+        for start, end, path_id in zip(self.starts, self.ends, self.path_ids):
+            yield make_logitem(start, end, path_id)
+
+    def _make_logitem(self, start, end, path_id):
+        return LogItem(
+            from_minutes(start),
+            from_minutes(end) if end != OPEN_END else None,
+            list(self.paths[path_id])
+        )
+
+    def append(self, start, end, tags):
+        if end and end < start:
+            raise LogtimeError("Wrong logitem, end datetime can't be smaller than start:\n{}\n{}\n{}".format(
+                format_datetime(start), WHITESPACED_DESCRIPTION_SEPARATOR.join(tags), format_datetime(end)
+            ))
+        self.starts.append(to_minutes(start))
+        self.ends.append(to_minutes(end) if end else OPEN_END)
+        self.path_ids.append(self.intern(tags))
+
+    def append_logitem(self, logitem):
+        self.append(logitem.start, logitem.end if logitem.ended else None, logitem.tags)
+
+    def extend(self, logitems):
+        for logitem in logitems:
+            self.append_logitem(logitem)
+
+    def pop(self):
+        logitem = self[-1]
+        for values in (self.starts, self.ends, self.path_ids):
+            values.pop()
+        return logitem
+
+    def intern(self, tags):
+        path = tuple(tags)
+        path_id = self._path_ids.get(path)
+        if path_id is None:
+            path_id = self._path_ids[path] = len(self.paths)
+            self.paths.append(path)
+        return path_id
+
+
+class ColumnarLog(Log):
+    def __init__(self, logitems=()):
+        self._logitems = Columns()
+        self._indexes = {}
+        if isinstance(logitems, str):
+            for row in LogItemsParser(_row).parse_text(logitems):
+                self._logitems.append(*row)
+        else:
+            for logitem in logitems:
+                self._logitems.append_logitem(logitem)
+
+    @classmethod
+    def _from_columns(cls, columns):
+        log = cls()
+        log._logitems = columns
+        return log
+
+    @classmethod
+    def _from_parsed_files(cls, columns):
+        return cls._from_columns(columns)
+
+    def append(self, logitem):
+        self._logitems.append_logitem(logitem)
+        self._update_indexes('add', len(self._logitems) - 1, self._logitems[-1])
+
+    # With numpy installed the methods below work on the whole arrays at
+    # once, without it they fall back to the ones of Log.
+
+    def __getitem__(self, datetime_slice):
+        if numpy is None or not isinstance(datetime_slice, slice):
+            return super().__getitem__(datetime_slice)
+        start = parse_date(datetime_slice.start)
+        stop = parse_date(datetime_slice.stop)
+        step = datetime_slice.step
+        if step or not (is_whole_minute(start) and is_whole_minute(stop)):
+            return super().__getitem__(slice(start, stop, step))
+        return self._cut_to_dates(start, stop)
+
+    def _cut_to_dates(self, start, stop):
+        now = to_minutes(datetime.now().replace(second=0, microsecond=0))
+        starts, ends, path_ids = self._logitems.as_numpy()
+        is_open = ends == OPEN_END
+        mask = numpy.ones(len(starts), bool)
+        if stop is not None:
+            stop = to_minutes(stop)
+            mask &= starts <= stop
+        if start is not None:
+            start = to_minutes(start)
+            mask &= numpy.where(is_open, now, ends) >= start
+        starts, ends, is_open = starts[mask], ends[mask], is_open[mask]
+        if start is not None:
+            starts = numpy.maximum(starts, start)
+        if stop is not None:
+            # Items going on are cut only if the slice ends before now.
+            cut = numpy.where(is_open, stop <= now, ends > stop)
+            ends = numpy.where(cut, stop, ends)
+        return self._from_columns(Columns.from_arrays(
+            starts, ends, path_ids[mask], self._logitems
+        ))
+
+    def sum(self):
+        closed, open_starts = self._closed_minutes_and_open_starts()
+        now = datetime.now()
+        return timedelta(minutes=int(closed.sum()) if numpy else sum(closed)) + sum(
+            (now - from_minutes(start) for start in open_starts), timedelta()
+        )
+
+    def _closed_minutes_and_open_starts(self):
+        columns = self._logitems
+        if numpy is None:
+            closed = [e - s for s, e in zip(columns.starts, columns.ends) if e != OPEN_END]
+            open_starts = [s for s, e in zip(columns.starts, columns.ends) if e == OPEN_END]
+            return closed, open_starts
+        starts, ends, _ = columns.as_numpy()
+        is_open = ends == OPEN_END
+        return ends[~is_open] - starts[~is_open], starts[is_open].tolist()
+
+    def group(self, *keys):
+        if not all(isinstance(k, int) for k in keys):
+            return super().group(*keys)
+        from .grouping import group_tag_totals
+        paths = self._logitems.paths
+        sums, open_items = self._sum_per_path()
+        totals = {}
+        for path_id, (minutes, count) in sums.items():
+            totals[paths[path_id]] = [timedelta(minutes=minutes), count]
+        now = datetime.now()
+        for start, path_id in open_items:
+            totals[paths[path_id]][0] += now - from_minutes(start)
+        return group_tag_totals(totals, keys or (0, ))
+
+    def _sum_per_path(self):
+        # Minutes of closed items and number of all items per path id, and
+        # start and path id of every item that is still going on.
+        columns = self._logitems
+        if numpy is None:
+            sums, open_items = {}, []
+            for start, end, path_id in zip(columns.starts, columns.ends, columns.path_ids):
+                total = sums.setdefault(path_id, [0, 0])
+                total[1] += 1
+                if end == OPEN_END:
+                    open_items.append((start, path_id))
+                else:
+                    total[0] += end - start
+            return sums, open_items
+        starts, ends, path_ids = columns.as_numpy()
+        is_open = ends == OPEN_END
+        minutes = numpy.where(is_open, 0, ends - starts)
+        counts = numpy.bincount(path_ids, minlength=len(columns.paths))
+        totals = numpy.bincount(path_ids, weights=minutes, minlength=len(columns.paths))
+        sums = {
+            path_id: (int(totals[path_id]), int(counts[path_id]))
+            for path_id in numpy.flatnonzero(counts).tolist()
+        }
+        open_items = list(zip(starts[is_open].tolist(), path_ids[is_open].tolist()))
+        return sums, open_items
+
+
+def _row(start, end, tags):
+    return start, end, tags
@@ -0,0 +1,97 @@
+from datetime import datetime
+from datetime import timedelta
+import os
+
+from .logtime import Log
+from .logtime import LogItemsParser
+
+
+class LogFollower:
+    """Keeps a Log of a file that is being appended to up to date.
+
+    `update` parses only the bytes added since the last call, going on
+    with the state the parser was left in. The item that was going on is
+    replaced once a new date line closes it, indexes of the log and the
+    totals per tags used by `sum` and `group` are changed in place. If
+    the file got shorter, it was rewritten and is parsed again.
+    """
+    def __init__(self, path, encoding='utf-8'):
+        self.path = path
+        self.encoding = encoding
+        self.reset()
+
+    def reset(self):
+        self.log = Log(())
+        self.offset = 0
+        self._parser = LogItemsParser()
+        # Items at the end of the log made from the unfinished last line
+        # or the open item, they are made again on every update.
+        self._tentative = 0
+        self._totals = {}
+
+    def update(self):
+        # Returns the log, parsing what was appended to the file since the
+        # last update.
+        with open(self.path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < self.offset:
+                self.reset()
+            f.seek(self.offset)
+            data = f.read()
+        for _ in range(self._tentative):
+            self.log.pop()
+        self._tentative = 0
+        end = data.rfind(b'\n') + 1
+        self.offset += end
+        for logitem in self._parser.feed(self._decode(data[:end])):
+            self._add(logitem)
+        self._add_tentative(data[end:])
+        return self.log
+
+    def _add_tentative(self, last_line):
+        # The last line may still be written to, it is parsed without
+        # changing the state of the parser.
+        parser = self._parser
+        state = parser.start, parser.description
+        logitems = []
+        try:
+            logitems.extend(parser.feed(self._decode(last_line + b'\n')))
+        except UnicodeDecodeError:
+            pass
+        logitems.append(parser.get_open_logitem())
+        parser.start, parser.description = state
+        for logitem in logitems:
+            if logitem:
+                self.log.append(logitem)
+                self._tentative += 1
+
+    def _decode(self, data):
+        return [line.rstrip('\r') for line in data.decode(self.encoding).split('\n')[:-1]]
+
+    def _add(self, logitem):
+        self.log.append(logitem)
+        _add_to_totals(self._totals, logitem, logitem.get_duration())
+
+    def sum(self):
+        totals = self._totals_with_tentative()
+        return sum((duration for duration, _ in totals.values()), timedelta())
+
+    def group(self, *levels):
+        from .grouping import group_tag_totals
+        return group_tag_totals(self._totals_with_tentative(), levels or (0, ))
+
+    def _totals_with_tentative(self):
+        totals = {tags: list(total) for tags, total in self._totals.items()}
+        logitems = self.log._logitems
+        now = datetime.now()
+        for logitem in logitems[len(logitems) - self._tentative:]:
+            # Open items end now, whenever they are asked for.
+            end = logitem.end if logitem.ended else max(now, logitem.start)
+            _add_to_totals(totals, logitem, end - logitem.start)
+        return totals
+
+
+def _add_to_totals(totals, logitem, duration):
+    total = totals.setdefault(tuple(logitem.tags), [timedelta(), 0])
+    total[0] += duration
+    total[1] += 1
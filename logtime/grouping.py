@@ -0,0 +1,138 @@
+from datetime import timedelta
+
+from .logtime import WHITESPACED_DESCRIPTION_SEPARATOR
+
+
+class Group:
+    def __init__(self, key=None):
+        self.key = key
+        self.duration = timedelta()
+        self.count = 0
+        self.children = {}
+
+    def __str__(self, indent=''):
+        lines = []
+        for child in self:
+            lines.append('{}{} = {}'.format(indent, child.key, child.duration))
+            if child.children:
+                lines.append(child.__str__(indent + '    '))
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return 'Group({}, {}, {})'.format(self.key, self.duration, self.count)
+
+    def __getitem__(self, key):
+        return self.children[key]
+
+    def __contains__(self, key):
+        return key in self.children
+
+    def __iter__(self):
+        return iter(sorted(self.children.values(), key=lambda g: g.key))
+
+    def __len__(self):
+        return len(self.children)
+
+    def sum(self):
+        return self.duration
+
+    def total_hours(self):
+        return self.duration.total_seconds() / 3600
+
+    def add(self, path, duration, count=1):
+        group = self
+        group.duration += duration
+        group.count += count
+        for key in path:
+            child = group.children.get(key)
+            if child is None:
+                child = group.children[key] = Group(key)
+            child.duration += duration
+            child.count += count
+            group = child
+
+
+def group(logitems, keys):
+    # Durations are first summed per distinct path of keys with one dict
+    # update per item, the tree with subtotals for every level is then
+    # built from those sums only.
+    if all(isinstance(k, int) for k in keys):
+        return _group_by_levels(logitems, keys)
+    keys = [_make_key(k) for k in keys]
+    totals = {}
+    for logitem in logitems:
+        path = []
+        # Items are cut to the slices of the queries on their path.
+        cut = logitem
+        for key, start, stop in keys:
+            k = key(logitem)
+            if k is not None and (start or stop):
+                narrowed = cut.cut_to_dates(start, stop)
+                if narrowed is None:
+                    break
+                cut = narrowed
+            if k is None:
+                break
+            path.append(k)
+        _add(totals, tuple(path), cut.get_duration())
+    return _build(totals)
+
+
+def _group_by_levels(logitems, levels):
+    # Every level is a function of the tags only, so items are summed per
+    # distinct tags first and levels are applied to those.
+    return group_tag_totals(tag_totals(logitems), levels)
+
+
+def tag_totals(logitems):
+    # Maps tuples of tags to [duration, count] of their items.
+    totals = {}
+    for logitem in logitems:
+        _add(totals, tuple(logitem.tags), logitem.get_duration())
+    return totals
+
+
+def group_tag_totals(totals, levels):
+    # totals maps tuples of tags to [duration, count] of their items.
+    by_levels = {}
+    for tags, (duration, count) in totals.items():
+        path = []
+        for level in levels:
+            if level >= len(tags):
+                break
+            path.append(WHITESPACED_DESCRIPTION_SEPARATOR.join(tags[:level + 1]))
+        _add(by_levels, tuple(path), duration, count)
+    return _build(by_levels)
+
+
+def _make_key(key):
+    # Function of a LogItem giving its key or None, with the bounds its
+    # duration is cut to.
+    if isinstance(key, int):
+        return (lambda l: (
+            WHITESPACED_DESCRIPTION_SEPARATOR.join(l.tags[:key + 1]) if key < len(l.tags) else None
+        ), None, None)
+    if isinstance(key, str):
+        from . import query
+        q = query.parse(key)
+        if q.left is None:
+            return (lambda l: key), q.start, q.stop
+        predicate = q.left.compile()
+        return (lambda l: key if predicate(l) else None), q.start, q.stop
+    return key, None, None
+
+
+def _add(totals, path, duration, count=1):
+    total = totals.get(path)
+    if total is None:
+        totals[path] = [duration, count]
+    else:
+        total[0] += duration
+        total[1] += count
+
+
+def _build(totals):
+    root = Group()
+    for path, (duration, count) in totals.items():
+        root.add(path, duration, count)
+    return root
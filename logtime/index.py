@@ -0,0 +1,94 @@
+from bisect import bisect_left
+from bisect import bisect_right
+from itertools import accumulate
+
+
+class StartIndex:
+    # Positions of LogItems sorted by start together with the running
+    # maximum of their ends. Items that overlap [start; stop] all lie
+    # between the first running maximum reaching start and the last
+    # start not after stop.
+    def __init__(self, logitems):
+        starts = [l.start for l in logitems]
+        ends = [l.end for l in logitems]
+        self.order = list(range(len(starts)))
+        if any(a > b for a, b in zip(starts, starts[1:])):
+            self.order.sort(key=starts.__getitem__)
+            starts = [starts[p] for p in self.order]
+            ends = [ends[p] for p in self.order]
+        self.starts = starts
+        self.ends = ends
+        self.max_ends = list(accumulate(ends, max))
+
+    def get_start(self):
+        return self.starts[0]
+
+    def add(self, position, logitem):
+        # Items are kept sorted by start, for one that starts after all
+        # the others this takes constant time.
+        i = bisect_right(self.starts, logitem.start)
+        self.order.insert(i, position)
+        self.starts.insert(i, logitem.start)
+        self.ends.insert(i, logitem.end)
+        self._update_max_ends(i)
+
+    def pop(self, position, logitem):
+        i = len(self.order) - 1
+        if self.order[i] != position:
+            i = self.order.index(position)
+        for values in (self.order, self.starts, self.ends):
+            del values[i]
+        self._update_max_ends(i)
+
+    def _update_max_ends(self, i):
+        # Running maximum of ends from sorted position i on.
+        max_ends = accumulate(self.ends[i:], max)
+        if i:
+            max_ends = [max(self.max_ends[i - 1], end) for end in max_ends]
+        self.max_ends[i:] = max_ends
+
+    def get_end(self):
+        return self.max_ends[-1]
+
+    def candidates(self, start, stop):
+        # Range of sorted positions that holds every overlapping item.
+        lo = bisect_left(self.max_ends, start) if start is not None else 0
+        hi = bisect_right(self.starts, stop) if stop is not None else len(self.starts)
+        return lo, hi
+
+    def overlapping(self, start, stop):
+        lo, hi = self.candidates(start, stop)
+        if start is None:
+            positions = self.order[lo:hi]
+        else:
+            positions = [
+                p for p, end in zip(self.order[lo:hi], self.ends[lo:hi]) if end >= start
+            ]
+        positions.sort()
+        return positions
+
+
+class TagIndex:
+    # Sorted positions of the LogItems with each tag.
+    def __init__(self, logitems):
+        self.size = len(logitems)
+        self.positions = {}
+        for position, logitem in enumerate(logitems):
+            for tag in set(logitem.tags):
+                self.positions.setdefault(tag, []).append(position)
+
+    def get(self, tag):
+        return self.positions.get(tag, ())
+
+    def add(self, position, logitem):
+        self.size += 1
+        for tag in set(logitem.tags):
+            self.positions.setdefault(tag, []).append(position)
+
+    def pop(self, position, logitem):
+        self.size -= 1
+        for tag in set(logitem.tags):
+            positions = self.positions[tag]
+            positions.pop()
+            if not positions:
+                del self.positions[tag]
@@ -0,0 +1,147 @@
+# Call counts, item counts and wall time of the hot paths of logtime.
+# Nothing is measured until enable wraps the functions in TARGETS, disable
+# puts the originals back, so there is no overhead while it's off. Times
+# include the time of instrumented functions called inside, e.g. of
+# parsing the dates of a slice in Log.__getitem__.
+from contextlib import contextmanager
+from functools import wraps
+from importlib import import_module
+import json
+import time
+
+
+class Stats:
+    def __init__(self):
+        self.calls = 0
+        self.items = 0
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return 'Stats({}, {}, {})'.format(self.calls, self.items, self.seconds)
+
+    def to_dict(self):
+        return {'calls': self.calls, 'items': self.items, 'seconds': self.seconds}
+
+
+def count_logs(result, args):
+    if isinstance(result, tuple):
+        return sum(len(log) for log in result)
+    return len(result)
+
+
+def count_self(result, args):
+    return len(args[0])
+
+
+def count_nothing(result, args):
+    return 0
+
+
+# Module, class and method of every instrumented function with how the
+# items it handled are counted. Items of generators are the ones they
+# yield.
+TARGETS = [
+    ('logtime', 'LogItemsParser', 'parse_lines', None),
+    ('parse_date', 'Parser', 'parse', count_nothing),
+    ('query', 'Parser', 'parse', count_nothing),
+    ('query', 'Slice', 'filter', count_logs),
+    ('logtime', 'Log', '__getitem__', count_logs),
+    ('logtime', 'Log', 'sum', count_self),
+    ('columnar', 'ColumnarLog', '__getitem__', count_logs),
+    ('columnar', 'ColumnarLog', 'sum', count_self),
+]
+
+stats = {}
+_originals = {}
+
+
+def enable():
+    if _originals:
+        return
+    for module_name, class_name, method_name, count in TARGETS:
+        cls = getattr(import_module('.' + module_name, __package__), class_name)
+        name = '{}.{}.{}'.format(module_name, class_name, method_name)
+        original = cls.__dict__[method_name]
+        _originals[cls, method_name] = original
+        setattr(cls, method_name, _wrap(original, stats.setdefault(name, Stats()), count))
+
+
+def disable():
+    for (cls, method_name), original in _originals.items():
+        setattr(cls, method_name, original)
+    _originals.clear()
+
+
+def reset():
+    for s in stats.values():
+        s.calls, s.items, s.seconds = 0, 0, 0.0
+
+
+@contextmanager
+def instrumented():
+    # Stats of what runs inside, starting from zero.
+    reset()
+    enable()
+    try:
+        yield stats
+    finally:
+        disable()
+
+
+def _wrap(function, stats, count):
+    if count is None:
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            stats.calls += 1
+            return _timed_generator(function(*args, **kwargs), stats)
+        return wrapper
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        stats.calls += 1
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            stats.seconds += time.perf_counter() - start
+        stats.items += count(result, args)
+        return result
+    return wrapper
+
+
+def _timed_generator(generator, stats):
+    # Only the time spent in the generator is counted, not the time of
+    # whoever consumes it.
+    perf_counter = time.perf_counter
+    while True:
+        start = perf_counter()
+        try:
+            item = next(generator)
+        except StopIteration:
+            stats.seconds += perf_counter() - start
+            return
+        stats.seconds += perf_counter() - start
+        stats.items += 1
+        yield item
+
+
+def to_json(stats=stats):
+    return json.dumps({name: s.to_dict() for name, s in stats.items()}, indent=4, sort_keys=True)
+
+
+PROMETHEUS_METRICS = [
+    ('calls', 'logtime_calls_total', 'Calls of instrumented logtime functions.'),
+    ('items', 'logtime_items_total', 'Log items handled by instrumented logtime functions.'),
+    ('seconds', 'logtime_seconds_total', 'Wall time spent in instrumented logtime functions.'),
+]
+
+
+def to_prometheus(stats=stats):
+    # Prometheus text exposition format, a counter per field of Stats.
+    lines = []
+    for field, metric, description in PROMETHEUS_METRICS:
+        lines.append('# HELP {} {}'.format(metric, description))
+        lines.append('# TYPE {} counter'.format(metric))
+        for name in sorted(stats):
+            lines.append('{}{{function="{}"}} {}'.format(metric, name, getattr(stats[name], field)))
+    return '\n'.join(lines) + '\n'
@@ -1,9 +1,10 @@
-from collections import defaultdict
+from bisect import bisect_left
+from bisect import bisect_right
 from datetime import timedelta
 from datetime import datetime
-import re
+import io
 
-from .parse_date import parse_date
+from .index import StartIndex
 
 TIME_FORMAT = '%M'
 DATETIME_FORMAT = '%Y-%m-%d %H:%M'
@@ -11,6 +12,9 @@ COMMENT_PREFIX = '# '
 DESCRIPTION_SEPARATOR = '/'
 WHITESPACED_DESCRIPTION_SEPARATOR = ' ' + DESCRIPTION_SEPARATOR + ' '
 REVERSE_ORDER_PREFIX = '-'
+# Parts of the text of a log written at once.
+WRITE_BUFFER_SIZE = 4096
+MAX_CACHED_DAYS = 100000
 
 
 class LogtimeError(Exception):
@@ -18,6 +22,8 @@ class LogtimeError(Exception):
 
 
 class LogItem:
+    __slots__ = ('start', 'end', 'ended', 'tags', '_hash')
+
     def __init__(self, start, end, tags):
         self.start = start
         self.end = end or datetime.now()
@@ -28,11 +34,11 @@ class LogItem:
 
     def __str__(self, include_end=True):
         text = '{}\n{}'.format(
-            self.start.strftime(DATETIME_FORMAT),
+            format_datetime(self.start),
             WHITESPACED_DESCRIPTION_SEPARATOR.join(self.tags),
         )
         if include_end:
-            text += '\n{}'.format(self.end.strftime(DATETIME_FORMAT))
+            text += '\n{}'.format(format_datetime(self.end))
         return text
 
     def __repr__(self):
@@ -41,7 +47,22 @@ class LogItem:
         )
 
     def __eq__(self, other):
-        return str(self) == str(other)
+        if not isinstance(other, LogItem):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        # Computed on first use and kept, items are not meant to change
+        # once they are in sets or dicts.
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = hash(self._key())
+            return self._hash
+
+    def _key(self):
+        # Open items are the same whenever they end.
+        return self.start, self.end if self.ended else None, tuple(self.tags)
 
     def get_duration(self):
         return self.end - self.start
@@ -54,11 +75,13 @@ class LogItem:
             return None
         elif start and start > self.end:
             return None
-        return LogItem(
+        cut = LogItem(
             max(start, self.start) if start else self.start,
             min(stop, self.end) if stop else self.end,
             self.tags
         )
+        cut.ended = self.ended or cut.end < self.end
+        return cut
 
 
 class Log:
@@ -66,27 +89,106 @@ class Log:
         if isinstance(logitems, str):
             logitems = self._parse(logitems)
         try:
-            self._logitems = tuple(logitems)
+            self._logitems = list(logitems)
         except TypeError as e:
-            self._logitems = (logitems, )
+            self._logitems = [logitems]
+        self._indexes = {}
 
     @staticmethod
     def _parse(text):
         return LogItemsParser().parse_text(text)
 
+    @classmethod
+    def from_file(cls, path, encoding='utf-8', workers=None):
+        # With workers the file is parsed in chunks in worker processes.
+        if workers:
+            from .parallel import parse_file
+            return cls._from_parsed_files(parse_file(path, workers, encoding))
+        return cls(iter_file(path, encoding))
+
+    @classmethod
+    def from_files(cls, paths, workers=None, start=None, stop=None, encoding='utf-8'):
+        # Items of all files sorted by start, parsed in worker processes.
+        # With start or stop they are cut to [start; stop] and files
+        # outside of it are skipped.
+        from .parallel import parse_files
+        start, stop = parse_date(start), parse_date(stop)
+        log = cls._from_parsed_files(parse_files(paths, workers, start, stop, encoding))
+        # Files are cut at whole minutes only.
+        if any(d and (d.second or d.microsecond) for d in (start, stop)):
+            return log[start:stop]
+        return log
+
+    @classmethod
+    def _from_parsed_files(cls, columns):
+        return cls(columns)
+
     def __str__(self):
-        texts = []
-        for logitem, next_logitem in zip(self, list(self)[1:] + [None]):
-            include_end = True
-            if not next_logitem and not logitem.ended:
-                include_end = False
-            if next_logitem and next_logitem.start == logitem.end:
-                include_end = False
-            texts.append(logitem.__str__(include_end=include_end))
-        return '\n'.join(texts)
+        output = io.StringIO()
+        self.write(output)
+        return output.getvalue()
+
+    def write(self, output):
+        # Writes the text of the log to output in one pass. The end of an
+        # item is left out when the next one starts at it, and when it's
+        # the last one and still going on.
+        parts = []
+        separator = ''
+        logitems = iter(self)
+        logitem = next(logitems, None)
+        while logitem is not None:
+            next_logitem = next(logitems, None)
+            parts.append(format_datetime(logitem.start))
+            parts.append(WHITESPACED_DESCRIPTION_SEPARATOR.join(logitem.tags))
+            if next_logitem.start != logitem.end if next_logitem else logitem.ended:
+                parts.append(format_datetime(logitem.end))
+            if len(parts) >= WRITE_BUFFER_SIZE:
+                output.write(separator + '\n'.join(parts))
+                parts, separator = [], '\n'
+            logitem = next_logitem
+        if parts:
+            output.write(separator + '\n'.join(parts))
+
+    def to_file(self, path, encoding='utf-8'):
+        with open(path, 'w', encoding=encoding) as f:
+            self.write(f)
 
     def __eq__(self, other):
-        return set(self._logitems) == set(other._logitems)
+        return set(map(LogItem._key, self)) == set(map(LogItem._key, other))
+
+    def diff(self, other):
+        # Logs of the items only in other and only in self, and pairs of
+        # items of both that start at the same time with different end or
+        # tags, with one pass over each log.
+        from collections import Counter
+        counts = Counter(map(LogItem._key, self))
+        added = []
+        for logitem in other:
+            key = logitem._key()
+            if counts[key]:
+                counts[key] -= 1
+            else:
+                added.append(logitem)
+        removed = []
+        for logitem in self:
+            key = logitem._key()
+            if counts[key]:
+                counts[key] -= 1
+                removed.append(logitem)
+        removed_by_start = {}
+        for logitem in removed:
+            removed_by_start.setdefault(logitem.start, []).append(logitem)
+        changed = []
+        for logitem in added:
+            same_start = removed_by_start.get(logitem.start)
+            if same_start:
+                changed.append((same_start.pop(0), logitem))
+        changed_items = {id(l) for pair in changed for l in pair}
+        return (
+            Log(l for l in added if id(l) not in changed_items),
+            Log(l for l in removed if id(l) not in changed_items),
+            changed,
+        )
 
     def __len__(self):
         return len(self._logitems)
@@ -98,18 +200,18 @@ class Log:
     def __getitem__(self, datetime_slice):
         if not isinstance(datetime_slice, slice):
             raise LogtimeError('You can subscribe Log only by slice. {}'.format(datetime_slice))
-        result = []
-        start = parse_date(datetime_slice.start) or self.get_start()
-        stop = parse_date(datetime_slice.stop) or self.get_end()
+        start = parse_date(datetime_slice.start)
+        stop = parse_date(datetime_slice.stop)
         step = datetime_slice.step
         if step:
+            start = start or self.get_start()
+            stop = stop or self.get_end()
+            bounds = [start]
             while start < stop:
-                next_start = start + step if isinstance(step, timedelta) else step(start)
-                result.append(Log(self.yield_cut_to_dates(start, next_start)))
-                start = next_start
-        else:
-            return Log(self.yield_cut_to_dates(start, stop))
-        return tuple(result)
+                start = start + step if isinstance(step, timedelta) else step(start)
+                bounds.append(start)
+            return tuple(Log(window) for window in self.cut_to_windows(bounds))
+        return Log(self.yield_cut_to_dates(start, stop))
 
     def __truediv__(self, f):
         return self.filter(f)
@@ -120,12 +222,58 @@ class Log:
             return query.parse(f).filter(self)
         return Log(l for l in self._logitems if f(l))
 
+    def group(self, *keys):
+        from .grouping import group
+        return group(self, keys or (0, ))
+
     def yield_cut_to_dates(self, start, stop):
-        for logitem in self._logitems:
-            cut = logitem.cut_to_dates(start, stop)
+        logitems = self._logitems
+        for position in self.get_index(StartIndex).overlapping(start, stop):
+            cut = logitems[position].cut_to_dates(start, stop)
             if cut:
                 yield cut
 
+    def select(self, positions, start=None, stop=None):
+        # Items at the set of positions, in order, cut to [start; stop].
+        # Only the smaller of the positions and the candidates from the
+        # start index is gone through.
+        logitems = self._logitems
+        if start is not None or stop is not None:
+            index = self.get_index(StartIndex)
+            lo, hi = index.candidates(start, stop)
+            if hi - lo < len(positions):
+                positions = [p for p in index.overlapping(start, stop) if p in positions]
+        cuts = (logitems[p].cut_to_dates(start, stop) for p in sorted(positions))
+        return Log(cut for cut in cuts if cut)
+
+    def cut_to_windows(self, bounds):
+        # Splits every item across the consecutive windows between bounds
+        # it overlaps, in a single pass over the items.
+        windows = [[] for _ in bounds[1:]]
+        if not windows:
+            return windows
+        last = len(windows) - 1
+        logitems = self._logitems
+        for position in self.get_index(StartIndex).overlapping(bounds[0], bounds[-1]):
+            logitem = logitems[position]
+            first = max(bisect_left(bounds, logitem.start) - 1, 0)
+            stop = min(bisect_right(bounds, logitem.end) - 1, last)
+            for i in range(first, stop + 1):
+                windows[i].append(logitem.cut_to_dates(bounds[i], bounds[i + 1]))
+        return windows
+
+    def get_index(self, Index):
+        index = self._indexes.get(Index)
+        if index is None:
+            index = self._indexes[Index] = Index(self._logitems)
+        return index
+
+    def rollup(self, bucket='day'):
+        # Durations per 'day', 'week' or 'month' and tag prefix, kept up
+        # to date by append.
+        from .rollup import ROLLUPS
+        return self.get_index(ROLLUPS[bucket])
+
     def map(self, f):
         return Log(f(i) for i in self)
 
@@ -146,58 +294,178 @@ class Log:
     def get_start(self):
         if (len(self) == 0):
             return datetime.now()
-        return min(l.start for l in self)
+        return self.get_index(StartIndex).get_start()
 
     def get_end(self):
         if (len(self) == 0):
             return datetime.now()
-        return max(l.end for l in self)
+        return self.get_index(StartIndex).get_end()
 
     def append(self, logitem):
-        self._logitems += (logitem, )
+        self._logitems.append(logitem)
+        self._update_indexes('add', len(self._logitems) - 1, logitem)
+
+    def extend(self, logitems):
+        first = len(self._logitems)
+        self._logitems.extend(logitems)
+        if self._indexes:
+            for position in range(first, len(self._logitems)):
+                self._update_indexes('add', position, self._logitems[position])
+
+    def pop(self):
+        logitem = self._logitems.pop()
+        self._update_indexes('pop', len(self._logitems), logitem)
+        return logitem
+
+    def _update_indexes(self, method, position, logitem):
+        for index in self._indexes.values():
+            getattr(index, method)(position, logitem)
+
+
+class LogStream:
+    # Log-like view that produces its LogItems again on every pass, so
+    # nothing but the current item is kept in memory.
+    def __init__(self, logitems):
+        self._logitems = logitems
+
+    @classmethod
+    def from_file(cls, path, encoding='utf-8'):
+        return cls(lambda: iter_file(path, encoding))
+
+    def __iter__(self):
+        return iter(self._logitems())
+
+    def __truediv__(self, f):
+        return self.filter(f)
+
+    def filter(self, f):
+        if isinstance(f, str):
+            from . import query
+            return LogStream(lambda: query.parse(f).yield_filtered(self))
+        return LogStream(lambda: (l for l in self if f(l)))
+
+    def group(self, *keys):
+        from .grouping import group
+        return group(self, keys or (0, ))
+
+    def map(self, f):
+        return LogStream(lambda: (f(i) for i in self))
+
+    def sum(self):
+        return sum((i.get_duration() for i in self), timedelta())
+
+    def total_seconds(self):
+        return self.sum().total_seconds()
+
+    def total_hours(self):
+        return self.total_seconds() / 3600
+
+
+_days = {}
+_minutes = []
+
+
+def format_datetime(date):
+    # Same as date.strftime(DATETIME_FORMAT), from cached texts of days and
+    # of minutes of the day. strftime doesn't pad years before 1000 on
+    # every platform, so they are left to it.
+    day = _days.get(date.toordinal())
+    if day is None:
+        if date.year < 1000:
+            return date.strftime(DATETIME_FORMAT)
+        if not _minutes:
+            _minutes.extend('{:02d}:{:02d}'.format(h, m) for h in range(24) for m in range(60))
+        if len(_days) >= MAX_CACHED_DAYS:
+            _days.clear()
+        day = _days[date.toordinal()] = '{:04d}-{:02d}-{:02d} '.format(date.year, date.month, date.day)
+    return day + _minutes[date.hour * 60 + date.minute]
+
+
+def parse_date(text):
+    # The parse_date module is only imported once a slice needs it.
+    if text is None or isinstance(text, datetime):
+        return text
+    from .parse_date import parse_date as parse
+    return parse(text)
+
+
+def iter_file(path, encoding='utf-8'):
+    with open(path, encoding=encoding) as f:
+        lines = (line.rstrip('\n') for line in f)
+        for logitem in LogItemsParser().parse_lines(lines):
+            yield logitem
 
 
 class LogItemsParser:
     def __init__(self, LogItem=LogItem):
         self.LogItem = LogItem
+        self.start, self.description = None, None
 
     def parse_text(self, text):
         lines = text.splitlines()
         return self.parse_lines(lines)
 
     def parse_lines(self, lines):
-        start, end, description = None, None, None
+        self.start, self.description = None, None
+        for logitem in self.feed(lines):
+            yield logitem
+        logitem = self.get_open_logitem()
+        if logitem:
+            yield logitem
+
+    def feed(self, lines):
+        # Yields items closed by lines and keeps the start and description
+        # of the last one, so parsing can go on with lines that come later.
+        parse_date = self.parse_date
+        start, description = self.start, self.description
         for line in lines:
             if line.startswith(COMMENT_PREFIX):
                 continue
-            start, end, description = self.advance_start_end_description(
-                line, start, end, description
-            )
-            if start and end and description:
-                yield self.LogItem(
-                    start, end, [t.strip() for t in description.split(DESCRIPTION_SEPARATOR)]
-                )
-                start, end, description = end, None, None
-        if start and description:
-            yield self.LogItem(
-                start,
-                None,
-                [t.strip() for t in description.split(DESCRIPTION_SEPARATOR)]
-            )
-
-    def advance_start_end_description(self, line, start, end, description):
-        maybe_date = self.parse_date(line)
-        if maybe_date:
-            if start and description:
-                end = maybe_date
-            else:
-                start = maybe_date
-        elif line:
-            description = line
-        return start, end, description
+            date = parse_date(line)
+            if date:
+                if start and description:
+                    yield self.make_logitem(start, date, description)
+                    start, description = date, None
+                else:
+                    start = date
+            elif line:
+                description = line
+        self.start, self.description = start, description
+
+    def get_open_logitem(self):
+        if self.start and self.description:
+            return self.make_logitem(self.start, None, self.description)
+
+    def make_logitem(self, start, end, description):
+        return self.LogItem(
+            start, end, [t.strip() for t in description.split(DESCRIPTION_SEPARATOR)]
+        )
 
     def parse_date(self, line):
+        return parse_datetime(line)
+
+
+def parse_datetime(line):
+    # Date lines are almost always exactly 'YYYY-MM-DD HH:MM', so check the
+    # fixed positions and build datetime from integer slices. Anything else
+    # that may still be a date goes through strptime, which stays the
+    # reference for what is accepted.
+    if (
+        len(line) == 16 and line[4] == '-' and line[7] == '-'
+        and line[10] == ' ' and line[13] == ':'
+        and line[:4].isdigit() and line[5:7].isdigit() and line[8:10].isdigit()
+        and line[11:13].isdigit() and line[14:].isdigit()
+    ):
         try:
-            return datetime.strptime(line, DATETIME_FORMAT)
+            return datetime(
+                int(line[:4]), int(line[5:7]), int(line[8:10]),
+                int(line[11:13]), int(line[14:])
+            )
         except ValueError:
-            return None
+            pass
+    if not line[:1].isdigit():
+        return None
+    try:
+        return datetime.strptime(line, DATETIME_FORMAT)
+    except ValueError:
+        return None
@@ -0,0 +1,124 @@
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from datetime import timedelta
+import os
+
+from .columnar import Columns
+from .columnar import _row
+from .logtime import LogItemsParser
+from .logtime import parse_datetime
+from .reader import LogReader
+
+
+def parse_files(paths, workers=None, start=None, stop=None, encoding='utf-8'):
+    """Columns of the items of all files, sorted by start.
+
+    Files are parsed in worker processes, which send back the arrays of
+    their columns instead of LogItems. With start or stop only the part
+    of every file around [start; stop] is parsed, and files whose first
+    and last date lines are outside of it aren't parsed at all, so like
+    `LogReader` this expects the files to be in chronological order.
+    Items are cut to whole minutes around [start; stop], cutting them
+    exactly is left to the caller.
+    """
+    start = start.replace(second=0, microsecond=0) if start else None
+    if stop and (stop.second or stop.microsecond):
+        stop = stop.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    paths = [p for p in paths if _overlaps(p, start, stop, encoding)]
+    tasks = [(p, start, stop, encoding) for p in paths]
+    return sort_by_start(concatenate(_map(_parse_file, tasks, workers)))
+
+
+def parse_file(path, workers=None, encoding='utf-8'):
+    """Columns of the items of one file, parsed in chunks in parallel.
+
+    The file is split at date lines into a chunk per worker. Every chunk
+    is parsed from scratch and sends back its columns with the start and
+    description of the item that was going on at its end. That item ends
+    at the first date line of the next chunk, as it would if the file
+    was parsed from the beginning, so items come out the same as from
+    `LogItemsParser`.
+    """
+    with LogReader(path, encoding=encoding) as reader:
+        chunks = reader.get_chunks(workers or os.cpu_count() or 1)
+    tasks = [(path, start, end, encoding, i == len(chunks) - 1) for i, (start, end) in enumerate(chunks)]
+    results = _map(_parse_chunk, tasks, workers)
+    parser = LogItemsParser(_row)
+    parts = []
+    for columns, first_date, state in results:
+        if parser.start and parser.description:
+            stitched = Columns()
+            stitched.append(*parser.make_logitem(parser.start, first_date, parser.description))
+            parts.append(_to_arrays(stitched))
+        parts.append(columns)
+        parser.start, parser.description = state
+    return concatenate(parts)
+
+
+def _map(function, tasks, workers):
+    if workers == 1 or len(tasks) < 2:
+        return [function(*task) for task in tasks]
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(function, *zip(*tasks)))
+
+
+def _parse_chunk(path, start, end, encoding, is_last):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode(encoding)
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    parser = LogItemsParser(_row)
+    columns = Columns()
+    for row in parser.feed(lines):
+        columns.append(*row)
+    if is_last:
+        row = parser.get_open_logitem()
+        if row:
+            columns.append(*row)
+    first_date = parse_datetime(lines[0]) if start else None
+    return _to_arrays(columns), first_date, (parser.start, parser.description)
+
+
+def _overlaps(path, start, stop, encoding):
+    with LogReader(path, encoding=encoding) as reader:
+        bounds = reader.get_bounds()
+    if bounds is None:
+        return False
+    first, last = bounds
+    if stop is not None and first > stop:
+        return False
+    return start is None or (last or datetime.now()) >= start
+
+
+def _parse_file(path, start, stop, encoding):
+    columns = Columns()
+    with LogReader(path, encoding=encoding) as reader:
+        columns.extend(reader[start:stop] if start or stop else reader)
+    return _to_arrays(columns)
+
+
+def _to_arrays(columns):
+    return columns.starts, columns.ends, columns.path_ids, columns.paths
+
+
+def concatenate(results):
+    # Columns of all results one after another, with their tag paths
+    # interned again.
+    columns = Columns()
+    for starts, ends, path_ids, paths in results:
+        path_id_map = [columns.intern(path) for path in paths]
+        columns.starts.extend(starts)
+        columns.ends.extend(ends)
+        columns.path_ids.extend(path_id_map[i] for i in path_ids)
+    return columns
+
+
+def sort_by_start(columns):
+    # Items that follow one another aren't sorted.
+    starts = columns.starts
+    if any(a > b for a, b in zip(starts, starts[1:])):
+        order = sorted(range(len(starts)), key=starts.__getitem__)
+        for values in (columns.starts, columns.ends, columns.path_ids):
+            values[:] = array(values.typecode, (values[i] for i in order))
+    return columns
@@ -1,6 +1,9 @@
 from collections import namedtuple
+from collections import OrderedDict
 from datetime import datetime, timedelta
 import calendar
+import re
+import time
 
 
 def parse_date(text='', now=None):
@@ -8,7 +11,68 @@ def parse_date(text='', now=None):
         return text
     if text == None:
         return text
-    return Parser(now).parse(text)
+    match = ISO_DATE.match(text)
+    if match:
+        return datetime(*(int(g) for g in match.groups() if g is not None))
+    return cache.parse(text, now or datetime.now())
+
+
+# Absolute dates like '2016-09-26' and '2016-09-26 14:00', parsed to the
+# same dates as Parser gives for them.
+ISO_DATE = re.compile(
+    r'[ \t\n]*([0-9]{4})-([0-9]{1,2})-([0-9]{1,2})'
+    r'(?:[ \t\n]+([0-9]{1,2}):([0-9]{1,2}))?[ \t\n]*$'
+)
+PARSE_CACHE_SIZE = 1024
+PARSE_CACHE_TTL = 3600
+
+
+class ParseCache:
+    # Dates parsed from texts like 'last week', kept for as long as the part
+    # of now they depend on stays the same, at most ttl seconds.
+    def __init__(self, size=PARSE_CACHE_SIZE, ttl=PARSE_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.resolutions = OrderedDict()
+        self.dates = OrderedDict()
+
+    def parse(self, text, now):
+        resolution = self.resolutions.get(text)
+        if resolution == 'now':
+            return Parser(now).parse(text)
+        if text in self.resolutions:
+            key = (text, truncate(now, resolution))
+            cached = self.dates.get(key)
+            if cached is not None and time.monotonic() - cached[1] < self.ttl:
+                self.dates.move_to_end(key)
+                return cached[0]
+        parser = Parser(now)
+        date = parser.parse(text)
+        self.remember(self.resolutions, text, parser.resolution)
+        if parser.resolution != 'now':
+            key = (text, truncate(now, parser.resolution))
+            self.remember(self.dates, key, (date, time.monotonic()))
+        return date
+
+    def remember(self, entries, key, value):
+        entries[key] = value
+        entries.move_to_end(key)
+        if len(entries) > self.size:
+            entries.popitem(last=False)
+
+    def clear(self):
+        self.resolutions.clear()
+        self.dates.clear()
+
+
+def truncate(now, resolution):
+    if resolution == 'minute':
+        return now.replace(**second_0)
+    if resolution == 'hour':
+        return now.replace(**minute_0)
+    if resolution == 'day':
+        return now.replace(**hour_0)
+    return None
 
 
 Token = namedtuple('Token', ['type', 'value'])
@@ -103,48 +167,33 @@ day_1.update({'day': 1})
 month_1 = dict(day_1.items())
 month_1.update({'month': 1})
 
+cache = ParseCache()
+
+
+TOKEN = re.compile(r'''
+    (?P<white_space>[{white_space}]+)
+  | (?P<number>[{numbers}]+)
+  | (?P<punctuation>[{punctuations}])
+  | (?P<word>[^{word_breaks}]+)
+'''.format(
+    white_space=re.escape(''.join(white_space)),
+    numbers=re.escape(''.join(numbers)),
+    punctuations=re.escape(''.join(punctuations)),
+    word_breaks=re.escape(''.join(word_breaks)),
+), re.VERBOSE)
+
 
 class Lexer:
     def tokenize(self, text):
-        self.chars = list(text.lower())
         self.tokens = []
-        word = ''
-        while self.chars:
-            c = self.pick()
-            if c in white_space:
-                self.pop()
-                continue
-            elif c in numbers:
-                self.read_number()
-            elif c in punctuations:
-                self.read_punctuation()
-            else:
-                self.read_word()
+        for match in TOKEN.finditer(text.lower()):
+            type = match.lastgroup
+            if type == 'number':
+                self.add('number', int(match.group(type)))
+            elif type != 'white_space':
+                self.add(type, match.group(type))
         return self.tokens
 
-    def pick(self):
-        if not self.chars:
-            return None
-        return self.chars[0]
-
-    def pop(self):
-        return self.chars.pop(0)
-
-    def read_number(self):
-        number = ''
-        while self.pick() and self.pick() in numbers:
-            number += self.pop()
-        self.add('number', int(number))
-
-    def read_punctuation(self):
-        self.add('punctuation', self.pop())
-
-    def read_word(self):
-        word = ''
-        while self.pick() and self.pick() not in word_breaks:
-            word += self.pop()
-        self.add('word', word)
-
     def add(self, type, value):
         value = synonyms.get(value, value)
         if type == 'word':
@@ -166,9 +215,11 @@ class Parser:
 
     def parse(self, text, now=None):
         self.tokens = Lexer().tokenize(text)
+        self.position = 0
         self.modifications = []
-        self.date = self.now
-        while self.tokens:
+        self.first_truncation = None
+        self.set_date(self.now, 'now')
+        while self.position < len(self.tokens):
             t = self.pick()
             if t.type == 'ampm':
                 self.pop()
@@ -190,38 +241,53 @@ class Parser:
                 self.pop()
         for modification in self.modifications:
             self.date = modification(self.date)
+        self.resolution = self.date_resolution
+        if self.resolution == 'now' and self.modifications:
+            self.resolution = self.first_truncation or 'now'
         return self.date
 
     def pick(self):
-        if not self.tokens:
+        if self.position >= len(self.tokens):
             return empty_token
-        return self.tokens[0]
+        return self.tokens[self.position]
 
     def pickpick(self):
-        try:
-            return self.tokens[1]
-        except IndexError:
+        if self.position + 1 >= len(self.tokens):
             return empty_token
+        return self.tokens[self.position + 1]
 
     def pop(self):
-        return self.tokens.pop(0)
+        self.position += 1
+        return self.tokens[self.position - 1]
 
     def is_eof(self):
-        return not self.tokens
-
-    def add_modification(self, modification):
+        return self.position >= len(self.tokens)
+
+    def set_date(self, date, resolution):
+        # resolution is the finest part of now that date depends on: 'now',
+        # 'minute', 'hour', 'day' or None when it doesn't depend on now.
+        self.date = date
+        self.date_resolution = resolution
+
+    def add_modification(self, modification, truncation=None):
+        # truncation is the resolution up to which a modification looks at
+        # the date it gets, e.g. 'day' for weekdays. When the date is still
+        # now, the first modification decides what part of now the result
+        # depends on.
+        if not self.modifications:
+            self.first_truncation = truncation
         self.modifications.append(modification)
 
     def parse_date(self):
         date = self.pop().value
         if date == 'now':
-            self.date = self.now
+            self.set_date(self.now, 'now')
         elif date == 'today':
-            self.date = self.today
+            self.set_date(self.today, 'day')
         elif date == 'yesterday':
-            self.date = self.today - timedelta(days=1)
+            self.set_date(self.today - timedelta(days=1), 'day')
         elif date == 'tomorrow':
-            self.date = self.today + timedelta(days=1)
+            self.set_date(self.today + timedelta(days=1), 'day')
 
     def parse_month(self):
         month = self.pop().value
@@ -243,7 +309,8 @@ class Parser:
     def parse_weekday(self):
         day = self.pop().value
         self.add_modification(
-            lambda d: find_weekday_in_week_of_date(day, d)
+            lambda d: find_weekday_in_week_of_date(day, d),
+            'day'
         )
 
     def parse_modifier(self):
@@ -263,7 +330,8 @@ class Parser:
             return False
         day = self.pop().value
         self.add_modification(
-            lambda d: find_weekday_in_week_of_date(day, d) + timedelta(days=sign * 7)
+            lambda d: find_weekday_in_week_of_date(day, d) + timedelta(days=sign * 7),
+            'day'
         )
         return True
 
@@ -282,31 +350,38 @@ class Parser:
         duration = self.pop().value
         if duration == 'year':
             self.add_modification(
-                lambda d: d.replace(year=d.year + sign, **month_1)
+                lambda d: d.replace(year=d.year + sign, **month_1),
+                'day'
             )
         elif duration == 'quarter':
             self.add_modification(
-                lambda d: add_months(find_begining_of_quarter(d), sign * 3)
+                lambda d: add_months(find_begining_of_quarter(d), sign * 3),
+                'day'
             )
         elif duration == 'month':
             self.add_modification(
-                lambda d: add_months(d, sign).replace(**day_1)
+                lambda d: add_months(d, sign).replace(**day_1),
+                'day'
             )
         elif duration == 'week':
             self.add_modification(
-                lambda d: find_weekday_in_week_of_date('monday', d) + timedelta(days=7 * sign)
+                lambda d: find_weekday_in_week_of_date('monday', d) + timedelta(days=7 * sign),
+                'day'
             )
         elif duration == 'day':
             self.add_modification(
-                lambda d: (d + timedelta(days=1)).replace(**hour_0)
+                lambda d: (d + timedelta(days=1)).replace(**hour_0),
+                'day'
             )
         elif duration == 'hour':
             self.add_modification(
-                lambda d: (d + timedelta(hours=sign)).replace(**minute_0)
+                lambda d: (d + timedelta(hours=sign)).replace(**minute_0),
+                'hour'
             )
         elif duration == 'minute':
             self.add_modification(
-                lambda d: (d + timedelta(minutes=sign)).replace(**second_0)
+                lambda d: (d + timedelta(minutes=sign)).replace(**second_0),
+                'minute'
             )
 
     def parse_punctuation(self):
@@ -349,7 +424,7 @@ class Parser:
         elif self.maybe_parse_duration_after_number(first_number):
             return
         else:
-            self.date = datetime(first_number, 1, 1)
+            self.set_date(datetime(first_number, 1, 1), None)
 
     def maybe_parse_24_time(self, hour):
         t = self.pick()
@@ -386,7 +461,8 @@ class Parser:
         ampm = self.pop().value
         number = convert_hour_to_24_clock(number, ampm)
         self.add_modification(
-            lambda d: d.replace(hour=number, **minute_0)
+            lambda d: d.replace(hour=number, **minute_0),
+            'day'
         )
         return True
 
@@ -395,7 +471,7 @@ class Parser:
             return False
         elif self.maybe_parse_month_after_year(year):
             return True
-        self.date = datetime(year, 1, 1)
+        self.set_date(datetime(year, 1, 1), None)
         return True
 
     def maybe_parse_month_after_year(self, year):
@@ -405,14 +481,14 @@ class Parser:
         if self.maybe_parse_day_after_month_year(year, month):
             return True
         else:
-            self.date = datetime(year, month, 1)
+            self.set_date(datetime(year, month, 1), None)
             return True
 
     def maybe_parse_day_after_month_year(self, year, month):
         if not self.maybe_parse_dash():
             return False
         day = self.pop().value
-        self.date = datetime(year, month, day)
+        self.set_date(datetime(year, month, day), None)
         return True
 
     def maybe_parse_dash(self):
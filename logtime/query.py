@@ -1,24 +1,30 @@
 import re
 from datetime import datetime
 from collections import namedtuple
+from functools import lru_cache
 
 from .parse_date import parse_date
 from .logtime import Log
+from .index import TagIndex
 
 
 Token = namedtuple('Token', ['type', 'value'])
 
 
 def parse(text):
+    # Dates of the slice are parsed again on every call, so relative ones
+    # like today are bound to the time of the call, not of the parse.
+    return parse_cached(text).rebind()
+
+
+QUERY_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def parse_cached(text):
     return Parser().parse(text)
 
 
-WHITE_SPACE = (' ', '\n', '\t')
-PARENTHESIS = ('(', ')')
-SLICE_START = '['
-SLICE_SEPARATOR = ';'
-SLICE_END = ']'
-WORD_BREAKS = WHITE_SPACE + (SLICE_START, None) + PARENTHESIS
 BOOLEAN_OPERATORS = ('and', 'not', 'or')
 PRECEDENCE = {
     'or': 10,
@@ -29,64 +35,50 @@ PRECEDENCE = {
 }
 
 
+WHITE_SPACE = (' ', '\n', '\t')
+PARENTHESIS = ('(', ')')
+SLICE_START = '['
+SLICE_SEPARATOR = ';'
+SLICE_END = ']'
+WORD_BREAKS = WHITE_SPACE + (SLICE_START, None) + PARENTHESIS
+TOKEN = re.compile(r'''
+    (?P<white_space>[{white_space}]+)
+  | (?P<parenthesis>[{parenthesis}])
+  | "(?P<quoted>[^"]*)"?
+  | {slice_start}(?P<slice_start>[^{slice_separator}]*){slice_separator}?(?P<slice_stop>[^{slice_end}]*){slice_end}?
+  | (?P<word>[^{word_breaks}]+)
+'''.format(
+    white_space=re.escape(''.join(WHITE_SPACE)),
+    parenthesis=re.escape(''.join(PARENTHESIS)),
+    slice_start=re.escape(SLICE_START),
+    slice_separator=re.escape(SLICE_SEPARATOR),
+    slice_end=re.escape(SLICE_END),
+    word_breaks=re.escape(''.join(c for c in WORD_BREAKS if c)),
+), re.VERBOSE)
+
+
 class Lexer:
     def tokenize(self, text):
         self.tokens = []
-        self.chars = list(text)
-        while self.chars:
-            c = self.pick()
-            if c in WHITE_SPACE:
-                self.pop()
-            elif c in PARENTHESIS:
-                self.add('parenthesis', self.pop())
-            elif c == '"':
-                self.read_words_until_quote()
-            elif c == SLICE_START:
-                self.read_slice()
-            else:
-                self.read_word()
+        for match in TOKEN.finditer(text):
+            kind = match.lastgroup
+            if kind == 'parenthesis':
+                self.add('parenthesis', match.group(kind))
+            elif kind == 'quoted':
+                self.add('search term', match.group(kind))
+            elif kind in ('slice_start', 'slice_stop'):
+                start, stop = match.group('slice_start', 'slice_stop')
+                self.add('slice', (start or None, stop or None))
+            elif kind == 'word':
+                self.read_word(match.group(kind))
         return list(self.clean_up(self.tokens))
 
-    def pick(self):
-        if self.chars:
-            return self.chars[0]
-
-    def pop(self):
-        if self.chars:
-            return self.chars.pop(0)
-
-    def read_words_until_quote(self):
-        self.pop()
-        word = ''
-        while c.pick() and c.pick() != '"':
-            word += self.pop()
-        self.add('search term', word)
-
-    def read_word(self):
-        word = self.read_until_word_break()
+    def read_word(self, word):
         if word in BOOLEAN_OPERATORS:
             self.add('boolean operator', word)
         else:
             self.add('search term', word)
 
-    def read_until_word_break(self):
-        word = ''
-        while self.pick() not in WORD_BREAKS:
-            word += self.pop()
-        return word
-
-    def read_slice(self):
-        self.pop()
-        start = ''
-        while self.pick() and self.pick() != SLICE_SEPARATOR:
-            start += self.pop()
-        self.pop()
-        stop = ''
-        while self.pick() and self.pick() != SLICE_END:
-            stop += self.pop()
-        self.add('slice', (start or None, stop or None))
-        self.pop()
-
     def add(self, type, value):
         self.tokens.append(Token(type, value))
 
@@ -94,33 +86,36 @@ class Lexer:
         return self.join_search_terms(tokens)
 
     def join_search_terms(self, tokens):
-        previous = None
+        words = []
         for token in tokens:
-            if previous and previous.type == 'search term' and token.type == 'search term':
-                previous = Token('search term', previous.value + ' ' + token.value)
-            else:
-                if previous:
-                    yield previous
-                previous = token
-        if previous:
-            yield previous
+            if token.type == 'search term':
+                words.append(token.value)
+                continue
+            if words:
+                yield Token('search term', ' '.join(words))
+                words = []
+            yield token
+        if words:
+            yield Token('search term', ' '.join(words))
 
 
 class Parser:
     def parse(self, text):
         self.text = text
         self.tokens = Lexer().tokenize(text)
+        self.position = 0
         query = self.parse_slice()
         return query
 
     def pick(self):
-        if self.tokens:
-            return self.tokens[0]
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
         return None
 
     def pop(self):
-        if self.tokens:
-            return self.tokens.pop(0)
+        if self.position < len(self.tokens):
+            self.position += 1
+            return self.tokens[self.position - 1]
         return None
 
     def parse_slice(self):
@@ -139,18 +134,18 @@ class Parser:
         t = self.pick()
         if t and not left:
             left = self.parse_unary_boolean_expression()
-        t = self.pick()
-        if t and t.type == 'boolean operator':
+        while True:
+            t = self.pick()
+            if not t or t.type != 'boolean operator':
+                return left
             current_precedence = PRECEDENCE[t.value]
-            if current_precedence > precedence:
-                self.pop()
-                right = self.parse_boolean_expression(
-                    self.parse_unary_boolean_expression(), current_precedence
-                )
-                return self.parse_boolean_expression(
-                    BooleanExpression(left, t.value, right), precedence
-                )
-        return left
+            if current_precedence <= precedence:
+                return left
+            self.pop()
+            right = self.parse_boolean_expression(
+                self.parse_unary_boolean_expression(), current_precedence
+            )
+            left = BooleanExpression(left, t.value, right)
 
     def parse_unary_boolean_expression(self):
         t = self.pick()
@@ -169,26 +164,54 @@ class Parser:
 
 
 class Query:
-    pass
+    _predicate = None
+
+    def compile(self):
+        # Whole expression as one function of a LogItem, made once per
+        # expression, instead of a matches call for every node and item.
+        if self._predicate is None:
+            constants = []
+            source = 'def predicate(logitem):\n    tags = logitem.tags\n    return bool({})\n'.format(
+                self.to_source(constants)
+            )
+            namespace = {'v{}'.format(i): c for i, c in enumerate(constants)}
+            exec(source, namespace)
+            self._predicate = namespace['predicate']
+        return self._predicate
 
 
 class Slice(Query):
     def __init__(self, left, start, stop):
         self.left = left
+        self.bounds = (start, stop)
         self.start = parse_date(start) if start is not None else None
         self.stop = parse_date(stop) if stop is not None else None
 
+    def rebind(self):
+        return Slice(self.left, *self.bounds)
+
     def __str__(self):
         return '({} [{};{}])'.format(
             self.left or '', self.start or '', self.stop or ''
         )
 
     def filter(self, log):
-        if self.left:
-            return Log(
-                l for l in log if self.left.matches(l)
-            )[self.start:self.stop]
-        return log[self.start:self.stop]
+        if self.left is None:
+            return log[self.start:self.stop]
+        if not isinstance(log, Log):
+            predicate = self.left.compile()
+            return Log(l for l in log if predicate(l))[self.start:self.stop]
+        positions = self.left.select(log.get_index(TagIndex))
+        return log.select(positions, self.start, self.stop)
+
+    def yield_filtered(self, logitems):
+        predicate = self.left.compile() if self.left else None
+        for logitem in logitems:
+            if predicate and not predicate(logitem):
+                continue
+            cut = logitem.cut_to_dates(self.start, self.stop)
+            if cut:
+                yield cut
 
     def matches(self, logitem):
         left_side = True
@@ -208,7 +231,16 @@ class BooleanExpression(Query):
         self.right = right
 
     def __str__(self):
-        return '({} {} {})'.format(self.left, self.operator, self.right)
+        # Long chains nest to the left, so walk down their left side
+        # without recursion.
+        expressions = []
+        left = self
+        while isinstance(left, BooleanExpression):
+            expressions.append(left)
+            left = left.left
+        return '(' * len(expressions) + str(left) + ''.join(
+            ' {} {})'.format(e.operator, e.right) for e in reversed(expressions)
+        )
 
     def matches(self, logitem):
         left_side = self.left.matches(logitem)
@@ -218,6 +250,36 @@ class BooleanExpression(Query):
         elif self.operator == 'or':
             return left_side or right_side
 
+    def select(self, index):
+        if self.operator not in ('and', 'or'):
+            return set()
+        operands = self.flatten()
+        if self.operator == 'or':
+            return set().union(*(o.select(index) for o in operands))
+        selected = [o.select(index) for o in operands]
+        selected.sort(key=len)
+        return selected[0].intersection(*selected[1:])
+
+    def flatten(self):
+        # Chains of the same operator nest to the left, walk them without
+        # recursion.
+        operands = []
+        stack = [self.right, self.left]
+        while stack:
+            expression = stack.pop()
+            if isinstance(expression, BooleanExpression) and expression.operator == self.operator:
+                stack.extend((expression.right, expression.left))
+            else:
+                operands.append(expression)
+        return operands
+
+    def to_source(self, constants):
+        if self.operator not in ('and', 'or'):
+            # matches of any other operator is None
+            return 'False'
+        operands = [o.to_source(constants) for o in self.flatten()]
+        return '({})'.format(' {} '.format(self.operator).join(operands))
+
 
 class UnaryBooleanExpression(Query):
     def __init__(self, operator, right):
@@ -230,6 +292,12 @@ class UnaryBooleanExpression(Query):
     def matches(self, logitem):
         return not self.right.matches(logitem)
 
+    def select(self, index):
+        return set(range(index.size)).difference(self.right.select(index))
+
+    def to_source(self, constants):
+        return '(not {})'.format(self.right.to_source(constants))
+
 
 class Atom(Query):
     def __init__(self, type, value):
@@ -241,3 +309,10 @@ class Atom(Query):
 
     def matches(self, logitem):
         return self.value in logitem.tags
+
+    def select(self, index):
+        return set(index.get(self.value))
+
+    def to_source(self, constants):
+        constants.append(self.value)
+        return '(v{} in tags)'.format(len(constants) - 1)
@@ -0,0 +1,197 @@
+from array import array
+from bisect import bisect_left
+import mmap
+import os
+
+from .logtime import Log
+from .logtime import LogItemsParser
+from .logtime import parse_datetime
+from .parse_date import parse_date
+
+
+class LogReader:
+    """Reads a log file through mmap and decodes only what a slice needs.
+
+    Slicing binary searches the date lines of the file, so it relies on
+    them being in chronological order (`utils.fix` puts them in order).
+    Offsets of all lines can be indexed once with `save_index` and reused
+    by later readers of the same, unchanged file.
+    """
+    def __init__(self, path, index_path=None, encoding='utf-8'):
+        self.path = path
+        self.encoding = encoding
+        self._file = open(path, 'rb')
+        self._size = os.fstat(self._file.fileno()).st_size
+        self._map = None
+        if self._size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index = None
+        if index_path and os.path.exists(index_path):
+            self._index = load_index(index_path, self._size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __iter__(self):
+        return self._parse_from(0)
+
+    def __getitem__(self, datetime_slice):
+        if not isinstance(datetime_slice, slice):
+            return Log(self)[datetime_slice]
+        start = parse_date(datetime_slice.start)
+        stop = parse_date(datetime_slice.stop)
+        offset = 0
+        if start is not None:
+            first = self._find_date_line(start)
+            offset = self._previous_date_line(first if first is not None else self._size)
+            offset = self._parse_start(offset)
+        return Log(self._parse_from(offset, stop))[start:stop:datetime_slice.step]
+
+    def get_bounds(self):
+        # Date of the first date line and of the last one, the last is None
+        # if the file ends with an item that is still going on. None when
+        # there are no date lines.
+        first = self._next_date_line(0)
+        if first is None:
+            return None
+        offset = self._previous_date_line(self._size)
+        logitems = list(self._parse_from(self._parse_start(offset)))
+        if logitems and not logitems[-1].ended:
+            return first[1], None
+        return first[1], self._date_at(offset, self._line_end(offset))
+
+    def get_chunks(self, count):
+        # About count byte ranges that cover the file, all but the first
+        # start with a date line. The first one holds the first date line,
+        # so the description of lines before it isn't lost between chunks.
+        first = self._next_date_line(0)
+        if first is None:
+            return [(0, self._size)]
+        offsets = [0]
+        for i in range(1, count):
+            found = self._next_date_line(max(self._size * i // count, offsets[-1] + 1, first[0] + 1))
+            if found is None:
+                break
+            if found[0] > offsets[-1]:
+                offsets.append(found[0])
+        return list(zip(offsets, offsets[1:] + [self._size]))
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = build_index(self._map, self._size)
+        return self._index
+
+    def save_index(self, path):
+        save_index(path, self.index, self._size)
+
+    def _parse_from(self, offset, stop=None):
+        return LogItemsParser().parse_lines(self._yield_lines(offset, stop))
+
+    def _yield_lines(self, offset, stop=None):
+        if self._map is None:
+            return
+        self._map.seek(offset)
+        readline = self._map.readline
+        encoding = self.encoding
+        line = readline()
+        while line:
+            text = line.decode(encoding).rstrip('\r\n')
+            yield text
+            if stop is not None:
+                date = parse_datetime(text)
+                if date and date > stop:
+                    return
+            line = readline()
+
+    def _find_date_line(self, date):
+        # Offset of the first date line that is not earlier than date,
+        # None if every date line is.
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found = self._next_date_line(mid)
+            if found is None or found[1] >= date:
+                hi = mid
+            else:
+                lo = found[0] + 1
+        found = self._next_date_line(lo)
+        return found[0] if found else None
+
+    def _next_date_line(self, offset):
+        offset = self._line_start_at_or_after(offset)
+        while offset < self._size:
+            end = self._line_end(offset)
+            date = self._date_at(offset, end)
+            if date:
+                return offset, date
+            offset = end + 1
+        return None
+
+    def _previous_date_line(self, offset):
+        # Start of the last date line before offset, where parsing has to
+        # begin to also get the item that ends at offset.
+        while offset > 0:
+            offset = self._map.rfind(b'\n', 0, offset - 1) + 1
+            if self._date_at(offset, self._line_end(offset)):
+                return offset
+        return 0
+
+    def _parse_start(self, offset):
+        # Where parsing has to begin to get the item of the date line at
+        # offset. Lines before the first date line are the description of
+        # the first item, so for that one it's the start of the file.
+        first = self._next_date_line(0)
+        return 0 if first is None or first[0] >= offset else offset
+
+    def _line_start_at_or_after(self, offset):
+        if self._index is not None:
+            i = bisect_left(self._index, offset)
+            return self._index[i] if i < len(self._index) else self._size
+        if offset == 0:
+            return 0
+        end = self._map.find(b'\n', offset - 1)
+        return end + 1 if end >= 0 else self._size
+
+    def _line_end(self, offset):
+        end = self._map.find(b'\n', offset)
+        return end if end >= 0 else self._size
+
+    def _date_at(self, offset, end):
+        return parse_datetime(self._map[offset:end].decode(self.encoding).rstrip('\r'))
+
+
+def build_index(data, size):
+    offsets = array('q')
+    if not size:
+        return offsets
+    offsets.append(0)
+    offset = data.find(b'\n')
+    while 0 <= offset < size - 1:
+        offsets.append(offset + 1)
+        offset = data.find(b'\n', offset + 1)
+    return offsets
+
+
+def save_index(path, index, size):
+    with open(path, 'wb') as f:
+        array('q', [size]).tofile(f)
+        index.tofile(f)
+
+
+def load_index(path, size):
+    # Offsets are only reused for the file size they were built for.
+    offsets = array('q')
+    with open(path, 'rb') as f:
+        offsets.frombytes(f.read())
+    if not offsets or offsets[0] != size:
+        return None
+    return offsets[1:]
@@ -0,0 +1,98 @@
+from bisect import bisect_right
+from datetime import timedelta
+import sys
+
+from . import colors
+from .grouping import group_tag_totals
+from .grouping import tag_totals
+from .index import StartIndex
+from .logtime import WHITESPACED_DESCRIPTION_SEPARATOR
+
+# Every report is made as one text and written at once.
+
+
+def print_progress(log, goal, width=50, output=None):
+    _write(format_progress(log, goal, width), output)
+
+
+def format_progress(log, goal, width=50):
+    done = log.sum()
+    left = max(goal - done, timedelta())
+    done_width = min(width, int(round(width * done / goal))) if goal else width
+    return '\n'.join([
+        colors.ON_GREEN + ' ' * done_width + colors.ON_BLUE + ' ' * (width - done_width) + colors.DEFC,
+        'done: ' + colors.green(format_duration(done)),
+        'left: ' + colors.blue(format_duration(left)),
+        'goal: ' + colors.gray(format_duration(goal)),
+    ])
+
+
+def print_timeline(log, start=None, end=None, step=timedelta(minutes=15), output=None):
+    _write(format_timeline(log, start, end, step), output)
+
+
+def format_timeline(log, start=None, end=None, step=timedelta(minutes=15)):
+    # A line for every step from start to end with the tags of the items
+    # going on during it, or ending at its beginning.
+    if not len(log):
+        return ''
+    start = start or log.get_start()
+    end = end or log.get_end()
+    bounds = [start]
+    while bounds[-1] + step < end:
+        bounds.append(bounds[-1] + step)
+    bounds.append(end)
+    cells = timeline_cells(log, bounds)
+    return '\n'.join(
+        colors.blue(str(bound)) + ' ' + ', '.join(cell)
+        for bound, cell in zip(bounds, cells)
+    )
+
+
+def timeline_cells(log, bounds):
+    # Descriptions of the items in each of the cells between bounds, in
+    # one sweep over the items that overlap them.
+    cells = [{} for _ in bounds[1:]]
+    last = len(cells) - 1
+    logitems = log._logitems
+    for position in log.get_index(StartIndex).overlapping(bounds[0], bounds[-1]):
+        logitem = logitems[position]
+        first = max(bisect_right(bounds, logitem.start) - 1, 0)
+        stop = min(bisect_right(bounds, logitem.end) - 1, last)
+        if first > last:
+            continue
+        description = ' - '.join(logitem.tags)
+        for i in range(first, stop + 1):
+            cells[i][description] = None
+    return cells
+
+
+def print_breakdown(log, output=None):
+    _write(format_breakdown(log), output)
+
+
+def format_breakdown(log):
+    # Durations of tags on every level, nested in the ones before them.
+    totals = tag_totals(log)
+    root = group_tag_totals(totals, range(max(map(len, totals), default=0)))
+    lines = []
+    _add_breakdown_lines(root, lines, '')
+    return '\n'.join(lines)
+
+
+def _add_breakdown_lines(group, lines, indent):
+    for child in group:
+        name = child.key.rsplit(WHITESPACED_DESCRIPTION_SEPARATOR, 1)[-1]
+        lines.append('{}{} = {}'.format(indent, name, child.duration))
+        _add_breakdown_lines(child, lines, indent + '    ')
+
+
+def format_duration(duration):
+    minutes = int(duration.total_seconds()) // 60
+    return '{:02d}:{:02d}'.format(minutes // 60, minutes % 60)
+
+
+def _write(text, output):
+    output = output or sys.stdout
+    output.write(text + '\n')
+    output.flush()
@@ -0,0 +1,250 @@
+from array import array
+from datetime import datetime
+from datetime import timedelta
+from itertools import accumulate
+from itertools import repeat
+from operator import add
+
+from .logtime import WHITESPACED_DESCRIPTION_SEPARATOR
+
+MICROSECOND = timedelta(microseconds=1)
+
+
+class Rollup:
+    """Durations of items per time bucket and tag prefix.
+
+    Keys are tag prefixes on every level, like the keys of `group`, and
+    None for all the items. Every key has cumulative sums of microseconds
+    from the first bucket of the log on, so a sum over any range of
+    buckets takes two lookups. Items are split across the buckets they
+    overlap. Open items are kept aside and counted up to now when asked.
+    It is one of the indexes of a log, so `append` updates it in place.
+    Subclasses set `number`, numbering buckets so that consecutive ones
+    have consecutive numbers, and `start_of` a bucket number.
+    """
+    def __init__(self, logitems):
+        # Numbers of the first and the last bucket with closed items.
+        self.origin = self.last = None
+        self.cumulative = {}
+        self.open = []
+        # Number of parts of closed items in every bucket that has any.
+        self.counts = {}
+        counts = self.counts
+        # Summed per distinct tags first, then per key.
+        per_tags = {}
+        number_of = self.number
+        for logitem in logitems:
+            if not logitem.ended:
+                self.open.append(logitem)
+                continue
+            per_bucket = per_tags.setdefault(tuple(logitem.tags), {})
+            number = number_of(logitem.start)
+            if number == number_of(logitem.end):
+                # Most items don't cross bucket boundaries.
+                duration = (logitem.end - logitem.start) // MICROSECOND
+                per_bucket[number] = per_bucket.get(number, 0) + duration
+                counts[number] = counts.get(number, 0) + 1
+                continue
+            for number, microseconds in self.split(logitem.start, logitem.end):
+                per_bucket[number] = per_bucket.get(number, 0) + microseconds
+                counts[number] = counts.get(number, 0) + 1
+        if not counts:
+            return
+        self.origin, self.last = min(counts), max(counts)
+        numbers = range(self.origin, self.last + 1)
+        totals = {}
+        for tags, per_bucket in per_tags.items():
+            values = list(map(per_bucket.get, numbers, repeat(0)))
+            for key in keys(tags):
+                total = totals.get(key)
+                totals[key] = values if total is None else list(map(add, total, values))
+        for key, values in totals.items():
+            self.cumulative[key] = array('q', accumulate(values, initial=0))
+
+    def split(self, start, end):
+        # Numbers of the buckets between start and end with microseconds
+        # of the time spent in each.
+        number = self.number(start)
+        while True:
+            stop = self.start_of(number + 1)
+            if stop >= end:
+                yield number, (end - start) // MICROSECOND
+                return
+            yield number, (stop - start) // MICROSECOND
+            start = stop
+            number += 1
+
+    def add(self, position, logitem):
+        if not logitem.ended:
+            self.open.append(logitem)
+        else:
+            self._change(logitem, 1)
+
+    def pop(self, position, logitem):
+        if not logitem.ended:
+            for i in reversed(range(len(self.open))):
+                if self.open[i].start == logitem.start and self.open[i].tags == logitem.tags:
+                    del self.open[i]
+                    return
+        else:
+            self._change(logitem, -1)
+
+    def _change(self, logitem, sign):
+        # Adds to the cumulative sums after the buckets of the item, which
+        # takes constant time for an item at the end of the log.
+        splits = list(self.split(logitem.start, logitem.end))
+        first = splits[0][0]
+        if self.origin is None:
+            self.origin = self.last = first
+        elif first < self.origin:
+            shift = array('q', [0] * (self.origin - first))
+            for cumulative in self.cumulative.values():
+                cumulative[0:0] = shift
+            self.origin = first
+        self.last = max(self.last, splits[-1][0])
+        for key in keys(logitem.tags):
+            cumulative = self.cumulative.setdefault(key, array('q', [0]))
+            for number, microseconds in splits:
+                i = number - self.origin + 1
+                if len(cumulative) <= i:
+                    cumulative.extend([cumulative[-1]] * (i + 1 - len(cumulative)))
+                for j in range(i, len(cumulative)):
+                    cumulative[j] += sign * microseconds
+        counts = self.counts
+        for number, _ in splits:
+            counts[number] = counts.get(number, 0) + sign
+            if not counts[number]:
+                del counts[number]
+        if sign < 0:
+            self._trim()
+
+    def _trim(self):
+        # Drops the buckets left empty at both ends, so the rollup has the
+        # buckets it would have if it was built again.
+        if not self.counts:
+            self.origin = self.last = None
+            self.cumulative = {}
+            return
+        first = self.origin
+        while first not in self.counts:
+            first += 1
+        last = self.last
+        while last not in self.counts:
+            last -= 1
+        # Cumulative sums before first are all zero.
+        for key, cumulative in self.cumulative.items():
+            self.cumulative[key] = cumulative[first - self.origin:last - self.origin + 2] or array('q', [0])
+        self.origin, self.last = first, last
+
+    def sum(self, key=None, start=None, stop=None):
+        # Time spent on key in the buckets that begin in [start; stop).
+        first, last = self._numbers(start, stop)
+        cumulative = self.cumulative.get(key)
+        total = 0
+        if cumulative is not None and first is not None:
+            total = self._cumulative(cumulative, last) - self._cumulative(cumulative, first)
+        return timedelta(microseconds=total) + self._open_sum(key, first, last)
+
+    def series(self, key=None, start=None, stop=None):
+        # Bucket starts with the time spent on key in each bucket.
+        first, last = self._numbers(start, stop)
+        if first is None:
+            return []
+        cumulative = self.cumulative.get(key, array('q', [0]))
+        values = [self._cumulative(cumulative, n) for n in range(first, last + 1)]
+        return [
+            (self.start_of(n), timedelta(microseconds=b - a) + self._open_sum(key, n, n + 1))
+            for n, a, b in zip(range(first, last), values, values[1:])
+        ]
+
+    def _numbers(self, start, stop):
+        # Range of numbers of the buckets that begin in [start; stop), all
+        # the buckets of the log by default.
+        if start and stop:
+            first = self._first_number(start)
+            return first, max(first, self._first_number(stop))
+        numbers = [self.number(l.start) for l in self.open]
+        if self.open:
+            numbers.append(self.number(datetime.now()))
+        if self.origin is not None:
+            numbers.append(self.origin)
+            numbers.append(self.last)
+        if not numbers:
+            return None, None
+        first = self._first_number(start) if start else min(numbers)
+        last = self._first_number(stop) if stop else max(numbers) + 1
+        return first, max(first, last)
+
+    def _first_number(self, date):
+        # Number of the first bucket that begins at date or later.
+        number = self.number(date)
+        return number if self.start_of(number) == date else number + 1
+
+    def _cumulative(self, cumulative, number):
+        # Sum of the buckets before the one with number.
+        if self.origin is None:
+            return 0
+        i = min(max(number - self.origin, 0), len(cumulative) - 1)
+        return cumulative[i]
+
+    def _open_sum(self, key, first, last):
+        total = timedelta()
+        if first is None:
+            return total
+        start, stop = self.start_of(first), self.start_of(last)
+        now = datetime.now()
+        for logitem in self.open:
+            if key is None or key in keys(logitem.tags):
+                end = min(max(now, logitem.start), stop)
+                total += max(end - max(logitem.start, start), timedelta())
+        return total
+
+
+def day_number(date):
+    return date.toordinal()
+
+
+def day_start(number):
+    return datetime.fromordinal(number)
+
+
+def week_number(date):
+    # Weeks start on Monday, like the first day of the ordinal calendar.
+    return (date.toordinal() - 1) // 7
+
+
+def week_start(number):
+    return datetime.fromordinal(number * 7 + 1)
+
+
+def month_number(date):
+    return date.year * 12 + date.month - 1
+
+
+def month_start(number):
+    return datetime(number // 12, number % 12 + 1, 1)
+
+
+class DayRollup(Rollup):
+    number = staticmethod(day_number)
+    start_of = staticmethod(day_start)
+
+
+class WeekRollup(Rollup):
+    number = staticmethod(week_number)
+    start_of = staticmethod(week_start)
+
+
+class MonthRollup(Rollup):
+    number = staticmethod(month_number)
+    start_of = staticmethod(month_start)
+
+
+ROLLUPS = {'day': DayRollup, 'week': WeekRollup, 'month': MonthRollup}
+
+
+def keys(tags):
+    # None for all the items and the prefixes of tags on every level.
+    return [None] + [
+        WHITESPACED_DESCRIPTION_SEPARATOR.join(tags[:level + 1]) for level in range(len(tags))
+    ]
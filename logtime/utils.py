@@ -1,3 +1,10 @@
+from itertools import chain
+from operator import itemgetter
+import heapq
+import io
+import pickle
+import tempfile
+
 from .logtime import LogItemsParser
 from .logtime import LogItem
 
@@ -20,14 +27,72 @@ class FixingLogItem(LogItem):
         return result
 
 def fix(log_text):
-    fixing_log_items = list(LogItemsParser(FixingLogItem).parse_text(log_text))
-    fixing_log_items.sort(key=lambda l: l.start)
-    fixing_log_items_with_nexts = zip(fixing_log_items, fixing_log_items[1:] + [None])
-    fixed_log_text = '\n'.join(
-        l.str(next) for l, next in fixing_log_items_with_nexts
-    )
-    max_end = max(*(l.end for l in fixing_log_items if l.end))
-    last_item = fixing_log_items[-1]
-    if last_item.end and last_item.end < max_end:
-        fixed_log_text += '\n' + max_end.strftime(DATETIME_FORMAT)
-    return fixed_log_text
+    output = io.StringIO()
+    write_fixed(log_text.splitlines(), output)
+    return output.getvalue()
+
+
+def write_fixed(lines, output, buffer_size=100000):
+    # Writes the log of lines with items sorted by start to output. Items
+    # are kept in memory only up to buffer_size, full buffers are sorted
+    # if needed and spilled to temporary files that are merged at the end.
+    runs = []
+    buffer = []
+    is_sorted = True
+    is_buffer_sorted = True
+    last_start = max_end = None
+    lines = (line.rstrip('\n') for line in lines)
+    for logitem in LogItemsParser(FixingLogItem).parse_lines(lines):
+        if buffer and logitem.start < buffer[-1][0]:
+            is_buffer_sorted = False
+        if last_start and logitem.start < last_start:
+            is_sorted = False
+        last_start = logitem.start
+        if logitem.end and (max_end is None or logitem.end > max_end):
+            max_end = logitem.end
+        buffer.append((logitem.start, logitem.end, logitem.tags))
+        if len(buffer) >= buffer_size:
+            if not is_buffer_sorted:
+                buffer.sort(key=itemgetter(0))
+            runs.append(_read_run(_spill(buffer)))
+            buffer, is_buffer_sorted = [], True
+    if not is_buffer_sorted:
+        buffer.sort(key=itemgetter(0))
+    runs.append(buffer)
+    if is_sorted:
+        rows = chain(*runs)
+    else:
+        rows = heapq.merge(*runs, key=itemgetter(0))
+    last = None
+    for row in rows:
+        logitem = FixingLogItem(*row)
+        if last:
+            output.write(last.str(logitem))
+            output.write('\n')
+        last = logitem
+    if last:
+        output.write(last.str(None))
+        if last.end and last.end < max_end:
+            output.write('\n' + max_end.strftime(DATETIME_FORMAT))
+
+
+SPILL_BATCH_SIZE = 1024
+
+
+def _spill(rows):
+    run = tempfile.TemporaryFile()
+    for i in range(0, len(rows), SPILL_BATCH_SIZE):
+        pickle.dump(rows[i:i + SPILL_BATCH_SIZE], run, pickle.HIGHEST_PROTOCOL)
+    run.seek(0)
+    return run
+
+
+def _read_run(run):
+    with run:
+        while True:
+            try:
+                rows = pickle.load(run)
+            except EOFError:
+                return
+            for row in rows:
+                yield row
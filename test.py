@@ -1,10 +1,27 @@
+import io
+import json
+import os
+import tempfile
 import unittest
 from datetime import datetime as dt
 from datetime import timedelta as td
 from logtime.logtime import Log
 from logtime.logtime import LogItem
+from logtime.logtime import LogStream
+from logtime import columnar
+from logtime.columnar import ColumnarLog
+from logtime.logtime import LogtimeError
+from logtime import parse_date
 from logtime.query import parse
+from logtime.reader import LogReader
+from logtime.follow import LogFollower
+from logtime import cache
+from logtime import instrument
+from logtime import report
+from logtime.index import StartIndex
+from logtime.index import TagIndex
 from logtime.utils import fix
+from logtime.utils import write_fixed
 
 
 class CutDate(unittest.TestCase):
@@ -176,6 +193,46 @@ test
 2018-03-29 10:00""")
 
 
+    def test_slicing_unsorted_log_keeps_order(self):
+        log = Log([
+            LogItem(dt(2018, 6, 29), dt(2018, 6, 30), ['c']),
+            LogItem(dt(2018, 6, 27), dt(2018, 7, 1), ['a']),
+            LogItem(dt(2018, 6, 25), dt(2018, 6, 26), ['b']),
+            LogItem(dt(2018, 6, 28), dt(2018, 6, 28, 12), ['d']),
+        ])
+        self.assertEqual(
+            [l.tags for l in log['2018-06-28 06:00':'2018-06-29']],
+            [['c'], ['a'], ['d']]
+        )
+        self.assertEqual(log.get_start(), dt(2018, 6, 25))
+        self.assertEqual(log.get_end(), dt(2018, 7, 1))
+
+    def test_slicing_after_append(self):
+        log = Log("""2018-06-28 09:00
+test
+2018-06-28 10:00""")
+        self.assertEqual(len(log['2018-06-29':]), 0)
+        log.append(LogItem(dt(2018, 6, 29), dt(2018, 6, 29, 1), ['test2']))
+        self.assertEqual(len(log['2018-06-29':]), 1)
+
+
+    def test_slicing_with_step_splits_long_items(self):
+        log = Log([
+            LogItem(dt(2018, 6, 28, 9), dt(2018, 6, 28, 11, 30), ['b']),
+            LogItem(dt(2018, 6, 28, 8, 30), dt(2018, 6, 28, 9), ['a']),
+        ])
+        output = log['2018-06-28 08:00':'2018-06-28 12:00':td(hours=1)]
+        self.assertEqual(
+            [[(l.start.time().isoformat(), l.tags) for l in window] for window in output],
+            [
+                [('09:00:00', ['b']), ('08:30:00', ['a'])],
+                [('09:00:00', ['b']), ('09:00:00', ['a'])],
+                [('10:00:00', ['b'])],
+                [('11:00:00', ['b'])],
+            ]
+        )
+
+
 
 def next_month(start):
     return (start + td(days=32)).replace(day=1, hour=0, minute=0, second=0)
@@ -251,6 +308,724 @@ a3m
         log = Log(text)
         self.assertEqual(str(log), text)
 
+    def test_write(self):
+        text = """1000-01-01 00:00
+old
+1000-01-01 01:00
+2018-06-28 09:00
+test / a
+2018-06-28 10:00
+open"""
+        log = Log(text)
+        output = io.StringIO()
+        log.write(output)
+        self.assertEqual(output.getvalue(), text)
+        self.assertEqual(str(log), text)
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            log.to_file(path)
+            self.assertEqual(str(Log.from_file(path)), text)
+        finally:
+            os.remove(path)
+
+    def test_write_fixed(self):
+        text = """2018-05-20 09:00
+foo
+2018-05-20 20:00
+2018-06-28 20:00
+test
+2018-06-28 10:00
+test2
+2018-06-29 11:00
+2018-04-20 09:00
+bar
+2018-04-20 20:00
+2018-04-21 09:00
+baz"""
+        for buffer_size in (1, 2, 100):
+            output = io.StringIO()
+            write_fixed(io.StringIO(text), output, buffer_size)
+            self.assertEqual(output.getvalue(), fix(text))
+
+    def test_fix_one_item(self):
+        text = "2018-05-20 09:00\nfoo"
+        self.assertEqual(fix(text), text)
+
+
+class Append(unittest.TestCase):
+    logitems = [
+        LogItem(dt(2018, 6, 28, 9), dt(2018, 6, 28, 12), ['a']),
+        LogItem(dt(2018, 6, 28, 10), dt(2018, 6, 28, 11), ['b', 'a']),
+        LogItem(dt(2018, 6, 29, 9), dt(2018, 6, 29, 10), ['a', 'c']),
+        LogItem(dt(2018, 6, 27, 9), dt(2018, 6, 30, 10), ['d']),
+        LogItem(dt(2018, 6, 29, 9), dt(2018, 6, 29, 9), ['b']),
+    ]
+
+    def test_indexes_updated(self):
+        for Log_ in (Log, ColumnarLog):
+            log = Log_(self.logitems[:1])
+            start_index, tag_index = log.get_index(StartIndex), log.get_index(TagIndex)
+            log.append(self.logitems[1])
+            log.extend(self.logitems[2:])
+            self.assert_same_indexes(log, self.logitems)
+            self.assertEqual(str(log.pop()), str(self.logitems[-1]))
+            self.assertEqual(str(log.pop()), str(self.logitems[-2]))
+            self.assert_same_indexes(log, self.logitems[:-2])
+            self.assertIs(log.get_index(StartIndex), start_index)
+            self.assertIs(log.get_index(TagIndex), tag_index)
+
+    def assert_same_indexes(self, log, logitems):
+        self.assertEqual(len(log), len(logitems))
+        start_index, expected = log.get_index(StartIndex), StartIndex(logitems)
+        for attribute in ('order', 'starts', 'ends', 'max_ends'):
+            self.assertEqual(getattr(start_index, attribute), getattr(expected, attribute))
+        tag_index, expected = log.get_index(TagIndex), TagIndex(logitems)
+        self.assertEqual(tag_index.size, expected.size)
+        self.assertEqual(dict(tag_index.positions), dict(expected.positions))
+
+    def test_filtered_log_unchanged(self):
+        log = Log(self.logitems[:2])
+        filtered = log.filter(lambda l: True)
+        log.append(self.logitems[2])
+        self.assertEqual(len(filtered), 2)
+
+
+class Diff(unittest.TestCase):
+    text = """2016-09-26 14:00
+tv
+2016-09-26 15:00
+eating / spiders
+2016-09-26 15:15
+programming / logtime
+2016-09-26 17:45"""
+
+    def test_hashable(self):
+        a = LogItem(dt(2018, 6, 28, 9), dt(2018, 6, 28, 12), ['a', 'b'])
+        b = LogItem(dt(2018, 6, 28, 9), dt(2018, 6, 28, 12), ['a', 'b'])
+        self.assertEqual(a, b)
+        self.assertEqual(len({a, b}), 1)
+        self.assertNotEqual(a, LogItem(dt(2018, 6, 28, 9), dt(2018, 6, 28, 12), ['a']))
+        self.assertNotEqual(a, LogItem(dt(2018, 6, 28, 9), dt(2018, 6, 28, 12, 0, 30), ['a', 'b']))
+        self.assertNotEqual(a, str(a))
+        c = LogItem(dt(2018, 6, 28, 9), dt(2018, 6, 28, 12), ('a', 'b'))
+        self.assertEqual(a, c)
+        self.assertEqual(len({a, c}), 1)
+        self.assertEqual(LogItem(dt(2018, 6, 28, 9), None, ['a']), LogItem(dt(2018, 6, 28, 9), None, ['a']))
+
+    def test_equal_logs(self):
+        self.assertEqual(Log(self.text), ColumnarLog(self.text))
+        self.assertNotEqual(Log(self.text), Log(self.text)[:'2016-09-26 17:00'])
+
+    def test_diff(self):
+        changed_text = self.text.replace('eating / spiders', 'eating / fish') + '\nsleeping\n2016-09-26 23:00'
+        changed_text = changed_text.replace('2016-09-26 14:00\ntv\n', '')
+        added, removed, changed = Log(self.text).diff(Log(changed_text))
+        self.assertEqual(str(added), '2016-09-26 17:45\nsleeping\n2016-09-26 23:00')
+        self.assertEqual(str(removed), '2016-09-26 14:00\ntv\n2016-09-26 15:00')
+        self.assertEqual([(old.tags, new.tags) for old, new in changed], [
+            (['eating', 'spiders'], ['eating', 'fish']),
+        ])
+        self.assertEqual(Log(self.text).diff(ColumnarLog(self.text)), (Log(()), Log(()), []))
+
+
+class Grouping(unittest.TestCase):
+    log = Log("""2016-09-26 14:00
+tv / steven universe
+2016-09-26 15:00
+eating / spiders
+2016-09-26 15:15
+programming / logtime / readme
+2016-09-26 17:45
+programming / finanse
+2016-09-26 19:00
+programming
+2016-09-26 19:30""")
+
+    def test_one_level(self):
+        self.assertEqual(str(self.log.group(0)), """eating = 0:15:00
+programming = 4:15:00
+tv = 1:00:00""")
+
+    def test_levels(self):
+        group = self.log.group(0, 1, 2)
+        self.assertEqual(group.sum(), td(hours=5, minutes=30))
+        self.assertEqual(group['programming'].count, 3)
+        self.assertEqual(str(group['programming']), """programming / finanse = 1:15:00
+programming / logtime = 2:30:00
+    programming / logtime / readme = 2:30:00""")
+
+    def test_query_and_function(self):
+        group = self.log.group('programming and not finanse', lambda l: l.start.hour)
+        self.assertEqual(str(group), """programming and not finanse = 3:00:00
+    15 = 2:30:00
+    19 = 0:30:00""")
+
+    def test_query_with_slice(self):
+        log = Log([LogItem(dt(2016, 1, 1, 10), dt(2016, 1, 1, 20), ['a'])])
+        query = 'a [2016-01-01 12:00;2016-01-01 13:00]'
+        self.assertEqual(log.group(query)[query].duration, td(hours=1))
+        self.assertEqual(log.group(query).sum(), log.filter(query).sum())
+        self.assertNotIn('b [2016-01-01 12:00;]', log.group('b [2016-01-01 12:00;]'))
+
+    def test_long_query(self):
+        query = ' or '.join('tag{}'.format(i) for i in range(2000)) + ' or tv'
+        self.assertEqual(self.log.group(query)[query].duration, td(hours=1))
+
+    def test_stream(self):
+        stream = LogStream(lambda: iter(self.log))
+        self.assertEqual(str(stream.group(1)), str(self.log.group(1)))
+
+
+class FromFile(unittest.TestCase):
+    text = """# comment
+2018-06-28 09:00
+test / a
+2018-06-28 10:00
+test2 / b
+2018-06-29 10:00
+2018-06-29 11:00
+test / c
+2018-06-29 12:00"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as f:
+            f.write(self.text)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_from_file(self):
+        self.assertEqual(str(Log.from_file(self.path)), str(Log(self.text)))
+
+    def test_stream_sum(self):
+        self.assertEqual(LogStream.from_file(self.path).sum(), td(hours=26))
+
+    def test_stream_filter(self):
+        stream = LogStream.from_file(self.path).filter('test [2018-06-28 09:30;]')
+        self.assertEqual(str(Log(stream)), """2018-06-28 09:30
+test / a
+2018-06-28 10:00
+2018-06-29 11:00
+test / c
+2018-06-29 12:00""")
+        self.assertEqual(stream.total_hours(), 1.5)
+
+
+class Reader(FromFile):
+    def test_iter(self):
+        with LogReader(self.path) as reader:
+            self.assertEqual(str(Log(reader)), str(Log(self.text)))
+
+    def test_slices(self):
+        log = Log(self.text)
+        slices = [
+            ('2018-06-28 09:30', '2018-06-29 10:30'),
+            ('2018-06-29 10:00', None),
+            (None, '2018-06-28 10:00'),
+            ('2018-06-30', None),
+            (None, '2018-01-01'),
+        ]
+        with LogReader(self.path) as reader:
+            for start, stop in slices:
+                self.assertEqual(str(reader[start:stop]), str(log[start:stop]))
+
+    def test_description_before_first_date(self):
+        text = 'pre\n2018-01-01 00:00\n2018-01-01 02:00\nnext\n2018-01-01 03:00'
+        with open(self.path, 'w') as f:
+            f.write(text)
+        log = Log(text)
+        with LogReader(self.path) as reader:
+            for start in ('2018-01-01 01:20', '2018-01-01 00:00', '2017-12-31'):
+                self.assertEqual(str(reader[start:]), str(log[start:]))
+            self.assertEqual(reader.get_bounds(), (dt(2018, 1, 1), dt(2018, 1, 1, 3)))
+        with open(self.path, 'w') as f:
+            f.write('pre\n2018-01-01 00:00')
+        with LogReader(self.path) as reader:
+            self.assertEqual([l.tags for l in reader['2018-01-01 01:20':]], [['pre']])
+            self.assertEqual(reader.get_bounds(), (dt(2018, 1, 1), None))
+
+    def test_saved_index(self):
+        index_path = self.path + '.index'
+        with LogReader(self.path) as reader:
+            reader.save_index(index_path)
+        try:
+            with LogReader(self.path, index_path) as reader:
+                self.assertEqual(list(reader.index), [0, 10, 27, 36, 53, 63, 80, 97, 106])
+                self.assertEqual(str(reader['2018-06-29 11:30':]), """2018-06-29 11:30
+test / c
+2018-06-29 12:00""")
+        finally:
+            os.remove(index_path)
+
+
+class Follow(FromFile):
+    def write(self, text, mode='a'):
+        with open(self.path, mode) as f:
+            f.write(text)
+
+    def test_follow(self):
+        follower = LogFollower(self.path)
+        self.assertEqual(str(follower.update()), str(Log(self.text)))
+        log = follower.log
+        for text in ['\ntest / d', '\n2018-06-29 1', '3:00', '\nnext\n', '# x\n2018-06-29 14:00\n']:
+            self.write(text)
+            with open(self.path) as f:
+                expected = Log(f.read())
+            self.assertIs(follower.update(), log)
+            self.assertEqual(str(log), str(expected))
+            self.assertEqual(str(log['2018-06-29 10:30':]), str(expected['2018-06-29 10:30':]))
+            self.assertEqual(str(log / 'test'), str(expected / 'test'))
+        self.assertEqual(follower.sum(), td(hours=28))
+        self.assertEqual(str(follower.group(0, 1)), str(expected.group(0, 1)))
+
+    def test_open_item(self):
+        self.write('\nopen')
+        follower = LogFollower(self.path)
+        self.assertFalse(list(follower.update())[-1].ended)
+        self.assertGreater(follower.sum(), td(hours=26))
+        self.write('\n2018-06-29 13:00')
+        self.assertEqual(follower.update().sum(), td(hours=27))
+        self.assertEqual(follower.sum(), td(hours=27))
+
+    def test_indexes_updated_in_place(self):
+        follower = LogFollower(self.path)
+        index = follower.update().get_index(StartIndex)
+        self.write('\n2018-06-30 10:00\nx\n2018-06-30 11:00')
+        self.assertIs(follower.update().get_index(StartIndex), index)
+        self.assertEqual(index.get_end(), dt(2018, 6, 30, 11))
+
+    def test_rewritten(self):
+        follower = LogFollower(self.path)
+        follower.update()
+        self.write('2018-06-28 09:00\nx\n2018-06-28 10:00', 'w')
+        self.assertEqual(str(follower.update()), '2018-06-28 09:00\nx\n2018-06-28 10:00')
+        self.assertEqual(follower.sum(), td(hours=1))
+
+
+class Cache(FromFile):
+    def setUp(self):
+        super().setUp()
+        self.cache_path = self.path + '.cache'
+
+    def tearDown(self):
+        super().tearDown()
+        if os.path.exists(self.cache_path):
+            os.remove(self.cache_path)
+
+    def load(self):
+        with open(self.path) as f:
+            expected = str(Log(f.read()))
+        self.assertEqual(str(cache.load_log(self.path)), expected)
+        self.assertEqual(str(cache.load_log(self.path)), expected)
+
+    def test_cached(self):
+        self.load()
+        header, _, columns, start, description = cache.load_cache(self.cache_path)
+        self.assertEqual(list(header)[2:], [len(self.text) - 16, 2, 2, columns.starts[-1] + 1500])
+        self.assertEqual(columns.paths, [('test', 'a'), ('test2', 'b')])
+        self.assertEqual((start, description), (dt(2018, 6, 29, 11), 'test / c'))
+
+    def test_appended(self):
+        self.load()
+        for text in ['\nopen', '\n2018-06-29 13', ':00\n', '2018-06-29 14:00\nx\n']:
+            with open(self.path, 'a') as f:
+                f.write(text)
+            self.load()
+        self.assertEqual(cache.load_cache(self.cache_path)[0][3], 4)
+
+    def test_changed(self):
+        self.load()
+        with open(self.path, 'r+') as f:
+            f.write('# changed, same size')
+        self.load()
+        with open(self.path, 'w') as f:
+            f.write('2018-06-28 09:00\nx')
+        self.load()
+
+
+    def test_corrupt(self):
+        self.load()
+        with open(self.cache_path, 'rb') as f:
+            data = f.read()
+        for broken in [data[:len(data) // 2], data[:20], data[:-3], data + b'\xff', data[:-1] + b'\xff']:
+            with open(self.cache_path, 'wb') as f:
+                f.write(broken)
+            self.load()
+            self.assertEqual(cache.load_cache(self.cache_path)[0][3], 2)
+
+
+class FromFiles(unittest.TestCase):
+    texts = ["""2018-06-29 10:00
+test / b
+2018-06-29 11:00
+test / c
+2018-06-29 12:00""", """2018-06-28 09:00
+test / a
+2018-06-28 10:00""", """2018-07-01 09:00
+test / d
+2018-07-01 10:00
+# nothing
+"""]
+
+    def setUp(self):
+        self.paths = []
+        for text in self.texts:
+            fd, path = tempfile.mkstemp()
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+            self.paths.append(path)
+
+    def tearDown(self):
+        for path in self.paths:
+            os.remove(path)
+
+    def test_from_files(self):
+        expected = Log('\n'.join(self.texts[1:2] + self.texts[:1] + self.texts[2:]))
+        for workers in (1, 2):
+            self.assertEqual(str(Log.from_files(self.paths, workers)), str(expected))
+        self.assertIsInstance(ColumnarLog.from_files(self.paths), ColumnarLog)
+
+    def test_sliced(self):
+        log = Log.from_files(self.paths, start='2018-06-29 10:30', stop=dt(2018, 6, 30, 0, 0, 30))
+        self.assertEqual(str(log), """2018-06-29 10:30
+test / b
+2018-06-29 11:00
+test / c
+2018-06-29 12:00""")
+
+    def test_chunked(self):
+        path = self.paths[0]
+        with open(path, 'w') as f:
+            f.write('\n'.join(self.texts[1:2] + self.texts[:1] + ['2018-06-30 10:00\nopen']))
+        expected = Log.from_file(path)
+        for workers in (2, 3, 8):
+            log = Log.from_file(path, workers=workers)
+            self.assertEqual(str(log), str(expected))
+            self.assertEqual([l.tags for l in log], [l.tags for l in expected])
+            self.assertFalse(list(log)[-1].ended)
+
+    def test_chunked_description_before_first_date(self):
+        path = self.paths[0]
+        with open(path, 'w') as f:
+            f.write('junk\n' * 100 + '2016-01-01 10:00\n2016-01-01 11:00\nbar\n2016-01-01 12:00\n')
+        expected = Log.from_file(path)
+        self.assertEqual(len(expected), 2)
+        for workers in (2, 3):
+            self.assertEqual(str(Log.from_file(path, workers=workers)), str(expected))
+
+    def test_chunked_empty_file(self):
+        path = self.paths[0]
+        open(path, 'w').close()
+        self.assertEqual(len(Log.from_file(path, workers=2)), 0)
+
+    def test_skipped(self):
+        from logtime import parallel
+        overlapping = [
+            parallel._overlaps(path, dt(2018, 6, 29, 11, 30), None, 'utf-8') for path in self.paths
+        ]
+        self.assertEqual(overlapping, [True, False, True])
+
+
+class Instrument(unittest.TestCase):
+    text = """2018-06-28 09:00
+test / a
+2018-06-28 10:00
+test2 / b
+2018-06-28 11:00"""
+
+    def test_counts(self):
+        sum_ = Log.sum
+        with instrument.instrumented() as stats:
+            log = Log(self.text)
+            log['2018-06-28 09:30':].sum()
+            log.filter('test2 [2018-06-28 10:30;]')
+        self.assertIs(Log.sum, sum_)
+        self.assertEqual(stats['logtime.LogItemsParser.parse_lines'].items, 2)
+        self.assertEqual(stats['logtime.Log.__getitem__'].calls, 1)
+        self.assertEqual(stats['logtime.Log.__getitem__'].items, 2)
+        self.assertEqual(stats['logtime.Log.sum'].items, 2)
+        self.assertEqual(stats['query.Slice.filter'].items, 1)
+        self.assertGreater(stats['logtime.Log.__getitem__'].seconds, 0)
+        log.sum()
+        self.assertEqual(stats['logtime.Log.sum'].calls, 1)
+
+    def test_export(self):
+        with instrument.instrumented() as stats:
+            Log(self.text).sum()
+        self.assertEqual(json.loads(instrument.to_json())['logtime.Log.sum']['calls'], 1)
+        self.assertIn('logtime_calls_total{function="logtime.Log.sum"} 1\n', instrument.to_prometheus())
+
+
+class Import(unittest.TestCase):
+    def test_core_only(self):
+        import subprocess
+        import sys
+        modules = subprocess.check_output([
+            sys.executable, '-c',
+            'import sys; from logtime import Log; print(" ".join(sorted(sys.modules)))'
+        ], cwd=os.path.dirname(os.path.abspath(__file__)), universal_newlines=True).split()
+        self.assertNotIn('logtime.query', modules)
+        self.assertNotIn('logtime.parse_date', modules)
+        self.assertNotIn('collections', modules)
+
+    def test_lazy_attributes(self):
+        import logtime
+        from logtime import query
+        self.assertIs(logtime.parse_query, query.parse)
+        self.assertIs(logtime.query, query)
+        self.assertIs(logtime.report, report)
+        # Not through the attribute, a test may have imported it already.
+        self.assertEqual(logtime.__getattr__('rollup').__name__, 'logtime.rollup')
+        with self.assertRaises(AttributeError):
+            logtime.nothing
+
+
+class Report(unittest.TestCase):
+    text = """2016-09-26 14:00
+tv
+2016-09-26 15:00
+eating / spiders
+2016-09-26 15:15
+programming / logtime / readme
+2016-09-26 17:45
+programming / finanse
+2016-09-26 18:00"""
+
+    def test_progress(self):
+        output = io.StringIO()
+        report.print_progress(Log(self.text), goal=td(hours=8), width=8, output=output)
+        lines = output.getvalue().split('\n')
+        self.assertEqual(lines[0], '\x1b[42m' + ' ' * 4 + '\x1b[44m' + ' ' * 4 + '\x1b[0m')
+        self.assertEqual(lines[1:4], [
+            'done: \x1b[32m04:00\x1b[0m',
+            'left: \x1b[34m04:00\x1b[0m',
+            'goal: \x1b[30m08:00\x1b[0m',
+        ])
+
+    def test_timeline(self):
+        text = report.format_timeline(
+            Log(self.text), start=dt(2016, 9, 26, 14, 45), end=dt(2016, 9, 26, 16)
+        )
+        self.assertEqual(text.split('\n'), [
+            '\x1b[34m2016-09-26 14:45:00\x1b[0m tv',
+            '\x1b[34m2016-09-26 15:00:00\x1b[0m tv, eating - spiders',
+            '\x1b[34m2016-09-26 15:15:00\x1b[0m eating - spiders, programming - logtime - readme',
+            '\x1b[34m2016-09-26 15:30:00\x1b[0m programming - logtime - readme',
+            '\x1b[34m2016-09-26 15:45:00\x1b[0m programming - logtime - readme',
+        ])
+
+    def test_timeline_like_slices(self):
+        log = Log(self.text)
+        step = td(minutes=20)
+        lines = report.format_timeline(log, step=step).split('\n')
+        self.assertEqual(len(lines), 12)
+        for i, line in enumerate(lines):
+            start = log.get_start() + i * step
+            stop = min(start + step, log.get_end())
+            expected = dict.fromkeys(' - '.join(l.tags) for l in log[start:stop] if l.start < stop)
+            self.assertEqual(line.split('\x1b[0m ')[1].split(', '), list(expected))
+
+    def test_breakdown(self):
+        self.assertEqual(report.format_breakdown(ColumnarLog(self.text)).split('\n'), [
+            'eating = 0:15:00',
+            '    spiders = 0:15:00',
+            'programming = 2:45:00',
+            '    finanse = 0:15:00',
+            '    logtime = 2:30:00',
+            '        readme = 2:30:00',
+            'tv = 1:00:00',
+        ])
+
+
+class Rollup(unittest.TestCase):
+    text = """2016-09-25 23:00
+tv
+2016-09-26 01:00
+programming / logtime
+2016-09-26 02:00
+2016-10-03 10:00
+programming / finanse
+2016-10-03 12:00"""
+
+    def test_split_across_buckets(self):
+        rollup = Log(self.text).rollup('day')
+        series = rollup.series('tv')
+        self.assertEqual(len(series), 9)
+        self.assertEqual(series[:3], [
+            (dt(2016, 9, 25), td(hours=1)), (dt(2016, 9, 26), td(hours=1)), (dt(2016, 9, 27), td()),
+        ])
+        self.assertEqual(rollup.sum(), td(hours=5))
+        self.assertEqual(rollup.sum('programming', dt(2016, 9, 26), dt(2016, 9, 27)), td(hours=1))
+        self.assertEqual(rollup.sum('programming / finanse', dt(2016, 9, 26)), td(hours=2))
+        self.assertEqual(rollup.sum('tv', dt(2016, 9, 25, 12)), td(hours=1))
+
+    def test_weeks_and_months(self):
+        log = Log(self.text)
+        self.assertEqual([d for d, _ in log.rollup('week').series()], [
+            dt(2016, 9, 19), dt(2016, 9, 26), dt(2016, 10, 3),
+        ])
+        self.assertEqual(log.rollup('week').sum('tv', dt(2016, 9, 26)), td(hours=1))
+        self.assertEqual(log.rollup('month').series('programming'), [
+            (dt(2016, 9, 1), td(hours=1)), (dt(2016, 10, 1), td(hours=2)),
+        ])
+
+    def test_append_and_pop(self):
+        logitems = list(Log(self.text))
+        log = Log(logitems[1:])
+        rollup = log.rollup()
+        log.append(LogItem(dt(2016, 10, 4, 23), dt(2016, 10, 5, 1), ['tv']))
+        log.append(logitems[0])
+        self.assertIs(log.rollup(), rollup)
+        self.assertEqual(rollup.sum('tv'), td(hours=4))
+        self.assertEqual(rollup.series(), Log(list(log)).rollup().series())
+        log.pop()
+        self.assertEqual(rollup.sum('tv', dt(2016, 10, 5)), td(hours=1))
+        self.assertEqual(rollup.sum(), td(hours=5))
+        self.assertEqual(rollup.series(), Log(list(log)).rollup().series())
+        log.pop()
+        self.assertEqual(rollup.series(), Log(list(log)).rollup().series())
+        self.assertEqual(rollup.series()[-1], (dt(2016, 10, 3), td(hours=2)))
+
+    def test_pop_all(self):
+        log = Log([LogItem(dt(2016, 1, 1, 10), dt(2016, 1, 1, 11), ['a'])])
+        rollup = log.rollup()
+        log.append(LogItem(dt(2016, 1, 5, 10), dt(2016, 1, 5, 11), ['b']))
+        log.pop()
+        self.assertEqual(rollup.series(), [(dt(2016, 1, 1), td(hours=1))])
+        self.assertEqual(rollup.last, rollup.origin)
+        log.pop()
+        self.assertEqual(rollup.series(), [])
+        self.assertEqual(rollup.sum(), td())
+        log.append(LogItem(dt(2016, 1, 3, 10), dt(2016, 1, 3, 11), ['b']))
+        self.assertEqual(rollup.series('b'), [(dt(2016, 1, 3), td(hours=1))])
+
+    def test_open_item(self):
+        log = Log(self.text)
+        log.append(LogItem(dt.now() - td(hours=1), None, ['tv']))
+        self.assertGreaterEqual(log.rollup().sum('tv'), td(hours=3))
+        log.pop()
+        self.assertEqual(log.rollup().sum('tv'), td(hours=2))
+
+
+class Columnar(unittest.TestCase):
+    text = """2018-06-28 09:00
+test / a
+2018-06-28 10:00
+test2 / b
+2018-06-29 10:00
+2018-06-29 11:00
+test / a
+2018-06-29 12:00
+open"""
+
+    def test_same_as_log(self):
+        log = ColumnarLog(self.text)
+        self.assertEqual(str(log), self.text)
+        self.assertEqual(len(log), 4)
+        self.assertEqual(str(log[:'2018-06-29 12:00']), str(Log(self.text)[:'2018-06-29 12:00']))
+
+    def test_interned_tags(self):
+        log = ColumnarLog(self.text)
+        self.assertEqual(list(log._logitems.path_ids), [0, 1, 0, 2])
+        self.assertEqual(log._logitems[2].tags, ['test', 'a'])
+
+    def test_append(self):
+        log = ColumnarLog(Log(self.text))
+        log.append(LogItem(dt(2018, 6, 30), dt(2018, 6, 30, 1), ['x']))
+        self.assertEqual(list(log)[-1].tags, ['x'])
+        self.assertFalse(list(log)[-2].ended)
+
+    def test_vectorized_like_log(self):
+        self.assert_like_log()
+
+    def test_without_numpy(self):
+        numpy, columnar.numpy = columnar.numpy, None
+        try:
+            self.assert_like_log()
+        finally:
+            columnar.numpy = numpy
+
+    def assert_like_log(self):
+        log, columnar_log = Log(self.text), ColumnarLog(self.text)
+        slices = [
+            ('2018-06-28 09:30', '2018-06-29 10:30'),
+            ('2018-06-29 11:30', None),
+            (None, '2018-06-28 09:30'),
+            ('2018-06-29 12:30', '2018-06-29 13:00'),
+            ('2018-06-28 09:30:10', None),
+        ]
+        for start, stop in slices:
+            self.assertEqual(str(columnar_log[start:stop]), str(log[start:stop]))
+        self.assertEqual(columnar_log[:'2018-06-29'].sum(), td(hours=15))
+        self.assertEqual(
+            str(columnar_log[:'2018-06-30'].group(0, 1)),
+            str(log[:'2018-06-30'].group(0, 1))
+        )
+
+    def test_end_before_start(self):
+        text = '2018-01-02 10:00\na\n2018-01-01 10:00'
+        with self.assertRaises(LogtimeError) as log_error:
+            Log(text)
+        with self.assertRaises(LogtimeError) as columnar_error:
+            ColumnarLog(text)
+        self.assertEqual(str(columnar_error.exception), str(log_error.exception))
+
+    def test_whole_minutes_only(self):
+        with self.assertRaises(LogtimeError):
+            ColumnarLog([LogItem(dt(2018, 6, 30), dt(2018, 6, 30, 1, 0, 1), ['x'])])
+
+
+class ParseDate(unittest.TestCase):
+    def setUp(self):
+        parse_date.cache.clear()
+
+    def test_iso_fast_path(self):
+        self.assertEqual(parse_date.parse_date('2016-09-26 14:00'), dt(2016, 9, 26, 14))
+        self.assertEqual(parse_date.parse_date(' 2016-9-6 '), dt(2016, 9, 6))
+        with self.assertRaises(ValueError):
+            parse_date.parse_date('2016-13-01')
+
+    def test_cached_for_same_day(self):
+        now = dt(2016, 9, 28, 14, 30, 15)
+        expected = dt(2016, 9, 19)
+        self.assertEqual(parse_date.parse_date('last week', now), expected)
+        self.assertEqual(parse_date.cache.resolutions['last week'], 'day')
+        self.assertEqual(parse_date.parse_date('last week', now + td(hours=5)), expected)
+        self.assertEqual(len(parse_date.cache.dates), 1)
+        self.assertEqual(parse_date.parse_date('last week', now + td(days=5)), dt(2016, 9, 26))
+
+    def test_resolutions(self):
+        now = dt(2016, 9, 28, 14, 30, 15)
+        for text, resolution in [
+            ('today - 3 days', 'day'),
+            ('next hour', 'hour'),
+            ('next minute', 'minute'),
+            ('monday 9am', 'day'),
+            ('2016 march', None),
+            ('now', 'now'),
+            ('- 3 days', 'now'),
+        ]:
+            parse_date.parse_date(text, now)
+            self.assertEqual(parse_date.cache.resolutions[text], resolution, text)
+        self.assertNotIn(('now', None), parse_date.cache.dates)
+
+    def test_bounded(self):
+        cache = parse_date.ParseCache(size=2)
+        now = dt(2016, 9, 28)
+        for text in ('today', 'yesterday', 'tomorrow'):
+            cache.parse(text, now)
+        self.assertEqual(list(cache.resolutions), ['yesterday', 'tomorrow'])
+        self.assertEqual(len(cache.dates), 2)
+
+    def test_expires(self):
+        cache = parse_date.ParseCache(ttl=0)
+        now = dt(2016, 9, 28)
+        cache.parse('today', now)
+        cache.dates[('today', now)] = (dt(2000, 1, 1), cache.dates[('today', now)][1])
+        self.assertEqual(cache.parse('today', now), now)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -3,7 +3,7 @@ from __future__ import unicode_literals
 import unittest
 from datetime import datetime
 
-from logtime.query import Lexer, parse, Token
+from logtime.query import Lexer, parse, parse_cached, Token
 from logtime.logtime import LogItem, Log
 
 
@@ -37,6 +37,13 @@ class TestLexer(unittest.TestCase):
     def test_full_slice(self):
         self.tokens('[;tomorrow]').are((('slice', (None, 'tomorrow')), ))
 
+    def test_quoted(self):
+        self.tokens('"a and b" or c').are((
+            ('search term', 'a and b'),
+            ('boolean operator', 'or'),
+            ('search term', 'c'),
+        ))
+
     def test_01(self):
         self.tokens('w and x or y [today;tomorrow]').are((
             ('search term', 'w'),
@@ -103,6 +110,11 @@ class TestParser(unittest.TestCase):
             '( [2016-10-10 00:00:00;2016-10-11 00:00:00])'
         )
 
+    def test_long(self):
+        text = ' or '.join('t{}'.format(i) for i in range(5000))
+        self.query(text)
+        self.assertTrue(str(self.query).endswith(' or t4998) or t4999) [;])'))
+
     def test_01(self):
         self.query(
             'w or not x and (r or u)'
@@ -203,5 +215,59 @@ a3m / no-rm""")
 a3m / no-rm""")
 
 
+class TestIndexedQuery(unittest.TestCase):
+    log = Log([
+        LogItem(datetime(2016, 10, 12), datetime(2016, 10, 13), ['w', 'r']),
+        LogItem(datetime(2016, 10, 10), datetime(2016, 10, 11), ['w']),
+        LogItem(datetime(2016, 10, 11), datetime(2016, 10, 12), ['e', 'r']),
+        LogItem(datetime(2016, 10, 9), datetime(2016, 10, 14), ['q']),
+    ])
+
+    def scan(self, text):
+        query = parse(text)
+        return Log(l for l in self.log if query.left.matches(l))[query.start:query.stop]
+
+    def test_same_as_scan(self):
+        for text in ('w', 'w and r', 'w or e', 'not w', 'not (w or q) and r', 'x or q',
+                     'w [2016-10-11;2016-10-12 12:00]', 'not e [2016-10-12;]',
+                     'w or q [;2016-10-10 06:00]'):
+            self.assertEqual(str(self.log.filter(text)), str(self.scan(text)), text)
+
+    def test_after_append(self):
+        log = Log(self.log)
+        self.assertEqual(len(log.filter('u')), 0)
+        log.append(LogItem(datetime(2016, 10, 15), datetime(2016, 10, 16), ['u']))
+        self.assertEqual(len(log.filter('u')), 1)
+
+
+class TestCompiledQuery(unittest.TestCase):
+    logitems = [
+        LogItem(datetime(2016, 10, 11), datetime(2016, 10, 11), tags.split('/'))
+        for tags in ('w', 'e/r', 'w/r', 'w/e', 'q/e', 'r/u', 'x')
+    ]
+
+    def test_same_as_matches(self):
+        for text in ('w', 'w and r', 'w or r', 'not w', 'w or not x and (r or u)',
+                     'not (x or w) and e', 'w and r or e and q or x'):
+            expression = parse(text).left
+            self.assertEqual(
+                [expression.compile()(l) for l in self.logitems],
+                [bool(expression.matches(l)) for l in self.logitems],
+                text
+            )
+
+    def test_long_chain(self):
+        text = ' or '.join('tag{}'.format(i) for i in range(500)) + ' or x'
+        predicate = parse(text).left.compile()
+        self.assertEqual([predicate(l) for l in self.logitems], [False] * 6 + [True])
+
+    def test_cached(self):
+        first, second = parse('w and r [today;]'), parse('w and r [today;]')
+        self.assertIsNot(first, second)
+        self.assertIs(first.left, second.left)
+        self.assertEqual(first.start, datetime.now().replace(hour=0, minute=0, second=0, microsecond=0))
+        self.assertIs(parse_cached('w and r [today;]').left, first.left)
+
+
 if __name__ == '__main__':
     unittest.main()